@@ -0,0 +1,95 @@
+"""比較 Flex Message 以 deepcopy 範本改值與預先編譯範本的每則成本.
+
+python benchmarks/bench_flex.py [通知數]
+
+兩種做法都量到送出前的 json.dumps 為止, 另外列出 N 則通知需要幾次 push.
+"""
+import copy
+import json
+import math
+import os
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+
+from linebot.models import FlexSendMessage, SendMessage  # noqa: E402
+
+from flextemplate import MAX_CAROUSEL_SIZE, FlexTemplate, carousel  # noqa: E402
+
+SLOTS = {
+    "message_title": ("body", "contents", 0, "text"),
+    "title_color": ("body", "contents", 0, "color"),
+    "title": ("body", "contents", 1, "contents", 1, "text"),
+    "link": ("body", "contents", 2, "contents", 1, "action", "uri"),
+    "published": ("body", "contents", 3, "contents", 1, "text"),
+}
+
+with open(os.path.join(ROOT, "line_flex_message_template.json"), encoding="utf-8") as f:
+    TEMPLATE = json.load(f)
+
+
+class RenderedFlexMessage(FlexSendMessage):
+    def __init__(self, alt_text: str, contents: dict) -> None:
+        SendMessage.__init__(self)
+        self.type = "flex"
+        self.alt_text = alt_text
+        self.contents = contents
+
+
+def make_posts(n: int):
+    return [
+        {
+            "message_title": "羽球場-中山國中",
+            "title_color": "#f5a142",
+            "title": f"112學年度羽球場地租借開放公告 {i}",
+            "link": f"https://reurl.cc/{i:06x}",
+            "published": f"2023/7/{1 + i % 28}",
+        }
+        for i in range(n)
+    ]
+
+
+def before(posts):
+    payloads = []
+    for post in posts:
+        template = copy.deepcopy(TEMPLATE)
+        template["body"]["contents"][0]["text"] = post["message_title"]
+        template["body"]["contents"][0]["color"] = post["title_color"]
+        template["body"]["contents"][1]["contents"][1]["text"] = post["title"]
+        template["body"]["contents"][2]["contents"][1]["action"]["uri"] = post["link"]
+        template["body"]["contents"][3]["contents"][1]["text"] = post["published"]
+        message = FlexSendMessage(alt_text="羽球場地通知", contents=template)
+        payloads.append(json.dumps(message.as_json_dict()))
+    return payloads
+
+
+def after(posts, compiled: FlexTemplate):
+    bubbles = [compiled.render(**post) for post in posts]
+    payloads = []
+    for i in range(0, len(bubbles), MAX_CAROUSEL_SIZE):
+        chunk = bubbles[i : i + MAX_CAROUSEL_SIZE]
+        message = RenderedFlexMessage("羽球場地通知", carousel(chunk))
+        payloads.append(json.dumps(message.as_json_dict()))
+    return payloads
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    posts = make_posts(n)
+    compiled = FlexTemplate(TEMPLATE, SLOTS)
+    for name, fn in [
+        ("before", lambda: before(posts)),
+        ("after", lambda: after(posts, compiled)),
+    ]:
+        seconds = min(timeit.repeat(fn, number=1, repeat=5))
+        print(f"{name:<8} {seconds / n * 1e6:8.1f} us/notification")
+    # push_message 一次最多 5 則訊息
+    print(
+        f"push calls for {n} notifications: before {math.ceil(n / 5)}, after {math.ceil(n / MAX_CAROUSEL_SIZE / 5)}"
+    )
+
+
+if __name__ == "__main__":
+    main()
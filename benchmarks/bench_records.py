@@ -0,0 +1,171 @@
+"""比較以 list + cols.index 表示公告與 PostSchema/Post 的記憶體與處理速度.
+
+python benchmarks/bench_records.py [--sizes 1000,100000] [--repeat 3]
+
+以合成的大量 HTML 表格公告走完一次 worker 的流程: 把列表頁的儲存格與詳細內容
+組成資料列、計算識別碼、依 md5 / 連結去重、取出通知用的欄位、轉成寫入資料表的資料列.
+儲存格的文字視為已經解析好的輸入, 不計入時間; 記憶體是用 tracemalloc 量 N 則公告
+在這些字串之外多佔的大小.
+"""
+import argparse
+import gc
+import hashlib
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from main import PostSchema  # noqa: E402
+
+COLUMNS = ["序號", "標題", "標題連結", "發布單位", "發布日期", "詳細內容", "相關連結", "相關檔案"]
+# 列表頁的表頭, 標題欄有連結
+HEADERS = ["序號", "標題", "發布單位", "發布日期", "點閱次數"]
+EXCLUDE_COLUMNS = ["點閱次數"]
+IDENTITY_KEYS = ["標題連結", "發布日期"]
+
+
+def make_feed(n: int):
+    """每則公告是 (列表頁的 [(文字, 連結)], 詳細內容 {欄位: 值})"""
+    return [
+        (
+            [
+                (str(i), None),
+                (
+                    f"112學年度羽球場地租借開放公告 {i}",
+                    f"https://www.zsjhs.tp.edu.cn/news/detail.php?id={i}",
+                ),
+                ("總務處", None),
+                (f"2023/{1 + i % 12}/{1 + i % 28}", None),
+                (str(i * 7), None),
+            ],
+            {
+                "詳細內容": f"本校體育館羽球場地開放租借, 詳細內容 {i}",
+                "相關連結": "無",
+                "相關檔案": "無",
+            },
+        )
+        for i in range(n)
+    ]
+
+
+def old_identity_hash(cols, row):
+    h = hashlib.blake2b(digest_size=8)
+    for key in IDENTITY_KEYS:
+        h.update(row[cols.index(key)].encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+
+def before(feed):
+    """改版前: 欄位清單邊讀邊長, 每個欄位都用 cols.index 找位置"""
+    columns = [c for c in HEADERS if c not in EXCLUDE_COLUMNS]
+    rows = []
+    for cells, _ in feed:
+        row = []
+        for header, (text, href) in zip(HEADERS, cells):
+            if header in EXCLUDE_COLUMNS:
+                continue
+            row.append(text)
+            if href:
+                if f"{header}連結" not in columns:
+                    columns.insert(columns.index(header) + 1, f"{header}連結")
+                row.append(href)
+        rows.append(row)
+    detail_columns = list(feed[0][1])
+    columns += detail_columns
+    for row, (_, detail) in zip(rows, feed):
+        row += list(detail.values())
+    columns.append("md5")
+    for row in rows:
+        row.append(old_identity_hash(columns, row))
+    md5_idx = columns.index("md5")
+    link_idx = columns.index("標題連結")
+    md5s = {row[md5_idx] for row in rows}
+    links = {row[link_idx] for row in rows}
+    # 送出通知與寫 log 時各查一次
+    fields = [
+        (
+            row[columns.index("標題")],
+            row[columns.index("標題連結")],
+            row[columns.index("發布日期")],
+            row[columns.index("標題")],
+            row[columns.index("發布日期")],
+        )
+        for row in rows
+    ]
+    return rows, md5s, links, fields, rows
+
+
+def after(feed, schema: PostSchema):
+    layout = [
+        (None, None)
+        if header in EXCLUDE_COLUMNS
+        else (schema.index.get(header), schema.index.get(f"{header}連結"))
+        for header in HEADERS
+    ]
+    index = schema.index
+    posts = []
+    for cells, detail in feed:
+        row = schema.empty()
+        for (text_idx, href_idx), (text, href) in zip(layout, cells):
+            if text_idx is not None:
+                row[text_idx] = text
+            if href_idx is not None and href:
+                row[href_idx] = href
+        for column, value in detail.items():
+            if column in index:
+                row[index[column]] = value
+        posts.append(schema.post(row))
+    md5s = {post.md5 for post in posts}
+    links = {post.link for post in posts}
+    fields = [
+        (post.title, post.link, post.published, post.title, post.published)
+        for post in posts
+    ]
+    return posts, md5s, links, fields, posts
+
+
+def measure(fn, n: int, *args) -> float:
+    feed = make_feed(n)
+    gc.collect()
+    started = time.perf_counter()
+    fn(feed, *args)
+    return time.perf_counter() - started
+
+
+def retained(fn, n: int, *args) -> int:
+    """fn 回傳的公告 (第一個結果) 在輸入字串之外多佔的記憶體"""
+    feed = make_feed(n)
+    gc.collect()
+    tracemalloc.start()
+    records = fn(feed, *args)[0]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    schema = PostSchema(COLUMNS, "標題", "標題連結", "發布日期", IDENTITY_KEYS)
+    for n in map(int, args.sizes.split(",")):
+        for name, fn, fn_args in [
+            ("before", before, ()),
+            ("after", after, (schema,)),
+        ]:
+            seconds = min(measure(fn, n, *fn_args) for _ in range(args.repeat))
+            size = retained(fn, n, *fn_args)
+            print(
+                f"{name:<7} {n:>8} posts {seconds * 1000:>9.1f} ms"
+                f" {seconds / n * 1e6:>7.2f} us/post {size / n:>6.0f} B/post"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""以 benchmarks/fixtures 離線量測解析與完整執行一輪的成本.
+
+python benchmarks/bench_replay.py [--scales 1,100,10000] [--notifier line]
+
+每個倍數會把 feed 放大 (複製表格列 / RSS 項目), 分別量測 extract_posts、
+extract_post_content、extract_rss_data、filter_rss_data, 以及對重播伺服器
+完整跑一次 run_all (cold: 空的資料庫, 每則都要送通知; warm: 內容沒變的第二輪;
+changed: 列表頁 / feed 有變動但公告都已存過, 要與上一份快照比較).
+10000x 的 run_all 要抓上萬個詳細內容頁, 需要數分鐘.
+"""
+import argparse
+import glob
+import importlib
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from replay import ReplayServer, bench_env, load_fixtures  # noqa: E402
+
+
+def measure(fn, *args, repeat: int = 1):
+    """回傳最快一次的秒數與結果"""
+    best, result = math.inf, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(name: str, scale: int, seconds: float, n: int, unit: str = "row"):
+    print(
+        f"{name:<28} {scale:>6}x {seconds * 1000:>10.1f} ms"
+        f" {seconds / max(n, 1) * 1e6:>10.1f} us/{unit} (n={n})"
+    )
+
+
+def bench_html(main, db, server: ReplayServer, table: str, scale: int, args):
+    worker = main.HTMLTableWorker(db, None, server.source(table))
+    page_content = server.page(table, scale).decode("utf-8")
+    seconds, (_, rows) = measure(worker.extract_posts, page_content, repeat=args.repeat)
+    report(f"{table} extract_posts", scale, seconds, len(rows))
+    # 詳細內容頁的成本與 feed 大小無關, 最多量 --max-details 頁
+    link_idx = worker.schema.index[worker.link_label]
+    urls = [row[link_idx] for row in rows][: args.max_details]
+    seconds, _ = measure(
+        lambda: [worker.extract_post_content(url) for url in urls],
+        repeat=args.repeat,
+    )
+    report(f"{table} extract_post_content", scale, seconds, len(urls), "page")
+
+
+def bench_rss(main, db, server: ReplayServer, table: str, scale: int, args):
+    worker = main.RSSWorker(db, None, server.source(table))
+    page = server.page(table, scale)
+    seconds, d = measure(worker.parse, page)
+    report(f"{table} feedparser.parse", scale, seconds, len(d["entries"]), "entry")
+    seconds, rss_data = measure(worker.extract_rss_data, d, repeat=args.repeat)
+    report(f"{table} extract_rss_data", scale, seconds, len(d["entries"]), "entry")
+    seconds, _ = measure(worker.filter_rss_data, rss_data, repeat=args.repeat)
+    report(f"{table} filter_rss_data", scale, seconds, len(rss_data))
+
+
+def bench_run_all(main, server: ReplayServer, workdir: str, scale: int, args):
+    server.factor = scale
+    for path in glob.glob(os.path.join(workdir, "bcdb.db*")):
+        os.remove(path)
+    message_worker = {"line": main.LineWorker, "discord": main.DiscordWorker}[
+        args.notifier
+    ]
+    bcfinder = main.BCFinder(db=main.DB, message_worker=message_worker)
+    server.revision = 0
+    for label in ("cold", "warm", "changed"):
+        if label == "changed":
+            server.revision += 1
+        before = dict(server.counts)
+        start = time.perf_counter()
+        bcfinder.run_all()
+        bcfinder.message_worker.flush()
+        seconds = time.perf_counter() - start
+        requests = {
+            kind: count - before.get(kind, 0)
+            for kind, count in server.counts.items()
+            if count > before.get(kind, 0)
+        }
+        print(
+            f"{f'run_all ({label})':<28} {scale:>6}x {seconds * 1000:>10.1f} ms  {requests}"
+        )
+    bcfinder.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="1,100,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-details", type=int, default=200)
+    parser.add_argument("--notifier", choices=["line", "discord"], default="line")
+    parser.add_argument("--skip-run-all", action="store_true")
+    args = parser.parse_args()
+    scales = [int(scale) for scale in args.scales.split(",")]
+
+    server = ReplayServer(load_fixtures())
+    workdir = bench_env(server, {"notify_max_batch_size": 500})
+    main = importlib.import_module("main")
+    main.load_config()
+    main.logger.remove()
+    main.logger.add(sys.stderr, level="WARNING")
+
+    db = main.DB()
+    for scale in scales:
+        for table, fixture in server.fixtures.items():
+            if fixture["type"] == "rss":
+                bench_rss(main, db, server, table, scale, args)
+            else:
+                bench_html(main, db, server, table, scale, args)
+    db.close()
+    if not args.skip_run_all:
+        for scale in scales:
+            bench_run_all(main, server, workdir, scale, args)
+
+
+if __name__ == "__main__":
+    main()
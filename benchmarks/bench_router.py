@@ -0,0 +1,83 @@
+"""比較逐一比對每個訂閱者的 regex 與合併成一個 KeywordMatcher 的每則公告成本.
+
+python benchmarks/bench_router.py [--subscribers 1,10,100,500] [--posts 10000]
+
+每個訂閱者有 5 個關鍵字, 從合成的運動 / 場地詞彙中抽出, 最後會確認兩種做法的結果一致.
+合併後的比對成本只跟標題長度與符合的訂閱者數量有關.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from keywordmatch import KeywordMatcher  # noqa: E402
+
+SPORTS = ["羽球", "桌球", "籃球", "排球", "網球", "游泳", "棒球", "足球", "壘球", "跆拳"]
+PLACES = ["場地", "教室", "體育館", "活動中心", "操場", "泳池", "球場", "社團", "校隊", "營隊"]
+ACTIONS = ["租借", "開放", "招生", "暫停", "維修", "公告", "報名", "收費", "異動", "說明"]
+
+
+def make_subscribers(n: int, rng: random.Random):
+    vocabulary = SPORTS + [s + p for s in SPORTS for p in PLACES] + ACTIONS
+    return [
+        {"name": f"s{i}", "to": f"U{i}", "keywords": rng.sample(vocabulary, 5)}
+        for i in range(n)
+    ]
+
+
+def make_titles(n: int, rng: random.Random):
+    return [
+        f"112學年度{rng.choice(SPORTS)}{rng.choice(PLACES)}{rng.choice(ACTIONS)}公告 第{i}號"
+        for i in range(n)
+    ]
+
+
+def naive(subscribers):
+    patterns = [
+        (i, re.compile("|".join(map(re.escape, subscriber["keywords"]))))
+        for i, subscriber in enumerate(subscribers)
+    ]
+    return lambda title: {i for i, pattern in patterns if pattern.search(title)}
+
+
+def merged(subscribers):
+    keywords: dict[str, set] = {}
+    for i, subscriber in enumerate(subscribers):
+        for keyword in subscriber["keywords"]:
+            keywords.setdefault(keyword, set()).add(i)
+    return KeywordMatcher(keywords).match
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", default="1,10,100,500")
+    parser.add_argument("--posts", type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    titles = make_titles(args.posts, rng)
+    for n in map(int, args.subscribers.split(",")):
+        subscribers = make_subscribers(n, rng)
+        results = {}
+        for name, build in [("naive", naive), ("merged", merged)]:
+            started = time.perf_counter()
+            match = build(subscribers)
+            built = time.perf_counter() - started
+            started = time.perf_counter()
+            results[name] = [match(title) for title in titles]
+            seconds = time.perf_counter() - started
+            matched = sum(map(len, results[name])) / len(titles)
+            print(
+                f"{name:<7} {n:>4} subscribers {seconds / len(titles) * 1e6:>8.2f} us/post"
+                f" ({matched:.1f} matched/post, build {built * 1000:.1f} ms)"
+            )
+        if results["naive"] != results["merged"]:
+            sys.exit("naive and merged results differ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""量測 DB.search 在歷史資料變多時的查詢延遲, 並與直接 LIKE 掃描 posts 表比較.
+
+python benchmarks/bench_search.py [--sizes 1000,100000] [--repeat 20]
+
+在暫存目錄建立 bcdb.db, 把合成的公告平均寫進三個來源 (一個 html-table, 兩個 rss),
+發布日期分散在最近幾年. 每種查詢取中位數.
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import main  # noqa: E402
+
+SPORTS = ["羽球", "桌球", "籃球", "排球", "網球", "游泳"]
+PLACES = ["場地", "教室", "體育館", "活動中心", "操場", "泳池"]
+ACTIONS = ["租借", "開放", "招生", "暫停", "維修", "公告"]
+SOURCES = ["zsjhs", "yhes", "smjh"]
+QUERIES = [
+    ("2 字 + 30 天", dict(keyword="羽球", days=30)),
+    ("4 字 + 30 天", dict(keyword="羽球場地", days=30)),
+    ("2 字, 不限日期", dict(keyword="羽球")),
+    ("4 字, 不限日期", dict(keyword="羽球場地")),
+    ("只限 7 天", dict(days=7)),
+]
+
+
+def fill(db: main.DB, n: int, rng: random.Random):
+    today = main.local_now().date()
+    for t, source in enumerate(SOURCES):
+        records = []
+        for i in range(t, n, len(SOURCES)):
+            published = today - datetime.timedelta(days=rng.randrange(3 * 365))
+            title = (
+                f"{rng.choice(SPORTS)}{rng.choice(PLACES)}{rng.choice(ACTIONS)} 第{i}號"
+            )
+            body = f"本校{rng.choice(SPORTS)}{rng.choice(PLACES)}相關說明 {i} " * 5
+            records.append(
+                (
+                    f"{i:016x}",
+                    title,
+                    f"https://example.tp.edu.tw/{source}/{i}",
+                    f"{published.year}/{published.month}/{published.day}",
+                    body,
+                    None,
+                )
+            )
+        db.insert_posts(source, records)
+
+
+def scan(db: main.DB, keyword: str = "", days=None, limit: int = 20):
+    """沒有索引的做法: LIKE 全掃, 日期字串在 Python 中轉換後再篩選"""
+    since = (
+        None
+        if days is None
+        else (main.local_now().date() - datetime.timedelta(days=days)).isoformat()
+    )
+    like = f"%{keyword}%"
+    results = []
+    with db.cursor() as cur:
+        cur.execute(
+            "SELECT source, title, link, published FROM posts"
+            " WHERE title LIKE ? OR inflate(body) LIKE ?",
+            (like, like),
+        )
+        for source, title, link, published in cur:
+            date = main.normalize_date(published)
+            if since is None or (date and date >= since):
+                results.append((date, source, title, link))
+    results.sort(reverse=True)
+    return results[:limit]
+
+
+def measure(fn, repeat: int) -> float:
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds)
+
+
+def bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,100000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    main.CONFIG.update({"tz": "Asia/Taipei"})
+    cwd = os.getcwd()
+    for n in map(int, args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            db = main.DB()
+            fill(db, n, random.Random(0))
+            db.execute("ANALYZE")
+            for name, query in QUERIES:
+                search = measure(lambda: db.search(**query), args.repeat)
+                full = measure(lambda: scan(db, **query), max(args.repeat // 10, 1))
+                print(
+                    f"{n:>8} posts  {name:<14} search {search * 1000:>8.2f} ms"
+                    f"   LIKE scan {full * 1000:>9.2f} ms"
+                )
+            db.close()
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,88 @@
+"""量測 import main 的啟動成本, 超過預算時以非 0 結束.
+
+python benchmarks/bench_startup.py [--budget-ms 120] [--runs 10]
+
+以 python -X importtime 取得 main 的累計 import 時間 (取中位數) 與最慢的模組,
+並確認平台 SDK 與解析器沒有在 import 時就被載入.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# 只有建立對應的 worker 時才需要的模組
+LAZY_MODULES = [
+    "aiohttp",
+    "bs4",
+    "feedparser",
+    "linebot",
+    "requests",
+    "pytz",
+    "http.server",
+    "cProfile",
+]
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def importtime() -> list[tuple[int, int, str]]:
+    """回傳 (累計微秒, 縮排深度, 模組) 的清單"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return [
+        (int(cumulative), len(indent), module)
+        for _, cumulative, indent, module in IMPORTTIME.findall(result.stderr)
+    ]
+
+
+def loaded_modules() -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print('\\n'.join(sys.modules))"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=120)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [importtime() for _ in range(args.runs)]
+    totals = [
+        next(us for us, _, module in run if module == "main") / 1000 for run in runs
+    ]
+    total = statistics.median(totals)
+    print(
+        f"import main: {total:.1f} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)"
+    )
+
+    # main 直接 import 的模組, 依累計時間排序
+    direct = sorted(
+        ((us, module) for us, depth, module in runs[-1] if depth == 3),
+        reverse=True,
+    )
+    for us, module in direct[:10]:
+        print(f"  {us / 1000:7.1f} ms  {module}")
+
+    eager = [module for module in LAZY_MODULES if module in loaded_modules()]
+    if eager:
+        print(f"loaded at import time: {', '.join(eager)}")
+    if eager or total > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""比較 baseline 各來源各一張資料表與統一的 posts 表: 去重、寫入的延遲與檔案大小.
+
+python benchmarks/bench_storage.py [--sizes 10000,100000,300000] [--days 720] [--retention 180]
+
+第一部分在已有 N 則公告的資料庫上, 量測一輪的 SQLite 操作與每則公告佔的檔案大小.
+baseline 是 DB.init_db 建立的 zsjhs 表 (內文不壓縮、沒有全文檢索), 每則公告以 md5
+查一次是否存在, 新的再各自寫入一次; 統一的 posts 表以 md5 與連結各查一次 20 則,
+再一次寫入 20 則並更新搜尋索引. 兩者共用同一條調校過的連線, 只比較資料表的差異.
+第二部分模擬每天寫入 --per-day 則公告、每天維護一次, 比較有無 retention_days 時
+資料庫老化後的寫入延遲與檔案大小.
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import main  # noqa: E402
+
+WORDS = ["羽球", "桌球", "場地", "租借", "開放", "體育館", "活動中心", "說明", "申請", "時段"]
+WORDS += ["本校", "因應", "維修", "暫停", "恢復", "收費", "標準", "辦法", "聯絡", "總務處"]
+COLUMNS = ["序號", "標題", "標題連結", "發布單位", "發布日期", "詳細內容", "相關連結", "相關檔案"]
+# baseline 的 DB.init_db
+LEGACY = """CREATE TABLE zsjhs
+    (
+        序號 VARCHAR(10),
+        標題 VARCHAR(100),
+        標題連結 VARCHAR(100),
+        發布單位 VARCHAR(20),
+        發布日期 VARCHAR(10),
+        詳細內容 TEXT,
+        相關連結 VARCHAR(10),
+        相關檔案 VARCHAR(10),
+        md5 VARCHAR(10) PRIMARY KEY
+    );
+"""
+BATCH = 20
+
+
+def make_post(schema: main.PostSchema, i: int, day: datetime.date, rng):
+    body = "".join(rng.choice(WORDS) for _ in range(rng.randrange(100, 600)))
+    values = schema.empty()
+    index = schema.index
+    values[index["序號"]] = str(i)
+    values[index["標題"]] = f"{rng.choice(WORDS)}{rng.choice(WORDS)}公告 第{i}號"
+    values[index["標題連結"]] = f"https://www.zsjhs.tp.edu.cn/news/detail.php?id={i}"
+    values[index["發布單位"]] = "總務處"
+    values[index["發布日期"]] = f"{day.year}/{day.month}/{day.day}"
+    values[index["詳細內容"]] = body
+    values[index["相關連結"]] = "無"
+    values[index["相關檔案"]] = "無"
+    return schema.post(values)
+
+
+def file_size(db: main.DB) -> tuple[int, int]:
+    """歸還空頁後的檔案大小與全文檢索佔的大小 (沒有 dbstat 時為 0)"""
+    db.con.executescript("PRAGMA incremental_vacuum;")
+    db.checkpoint()
+    try:
+        ((search,),) = db.query(
+            "SELECT coalesce(sum(pgsize), 0) FROM dbstat WHERE name LIKE 'post_search%'"
+        )
+    except sqlite3.OperationalError:
+        search = 0
+    return os.path.getsize(db.db_name), search
+
+
+def legacy_row(schema: main.PostSchema, post) -> list:
+    return [post[schema.index[col]] for col in COLUMNS] + [post.md5]
+
+
+def legacy_cycle(db: main.DB, schema: main.PostSchema, known: list, posts: list):
+    """baseline 的 DB.exist 與 DB.insert: 每則公告各查一次, 新的各自寫入並 commit"""
+    with db.cursor() as cur:
+        for post in known + posts:
+            cur.execute("SELECT COUNT(*) FROM zsjhs WHERE md5 = ?", (post.md5,))
+            if cur.fetchone()[0] == 0:
+                cur.execute(
+                    f"INSERT INTO zsjhs VALUES({','.join('?' * (len(COLUMNS) + 1))})",
+                    legacy_row(schema, post),
+                )
+
+
+def unified_cycle(db: main.DB, schema: main.PostSchema, known: list, posts: list):
+    with db.cursor() as cur:
+        for label, values in [
+            ("md5", [post.md5 for post in known]),
+            ("link", [post.link for post in known]),
+        ]:
+            cur.execute(
+                f"SELECT {label} FROM posts WHERE source = ? AND {label} IN ({','.join('?' * len(values))})",
+                ["zsjhs", *values],
+            )
+            cur.fetchall()
+    db.insert_posts("zsjhs", [schema.record(post) for post in posts])
+
+
+def bench_sizes(schema: main.PostSchema, sizes: list, repeat: int):
+    today = main.local_now().date()
+    for n in sizes:
+        rng = random.Random(0)
+        posts = [make_post(schema, i, today, rng) for i in range(n + BATCH * repeat)]
+        existing, fresh = posts[:n], posts[n:]
+        for name in ["legacy", "unified"]:
+            with tempfile.TemporaryDirectory() as workdir:
+                os.chdir(workdir)
+                db = main.DB()
+                if name == "legacy":
+                    db.con.executescript(LEGACY)
+                    with db.transaction() as con:
+                        con.executemany(
+                            f"INSERT INTO zsjhs VALUES({','.join('?' * (len(COLUMNS) + 1))})",
+                            [legacy_row(schema, post) for post in existing],
+                        )
+                    cycle = legacy_cycle
+                else:
+                    db.insert_posts("zsjhs", [schema.record(post) for post in existing])
+                    cycle = unified_cycle
+                size, search = file_size(db)
+                seconds = []
+                for r in range(repeat):
+                    known = rng.sample(existing, BATCH)
+                    started = time.perf_counter()
+                    cycle(db, schema, known, fresh[r * BATCH : (r + 1) * BATCH])
+                    seconds.append(time.perf_counter() - started)
+                db.close()
+            print(
+                f"{name:<8} {n:>8} posts  cycle {statistics.median(seconds) * 1000:>8.2f} ms"
+                f"  file {size / n:>6.0f} B/post (全文檢索 {search / n:.0f})"
+            )
+
+
+def bench_aging(schema: main.PostSchema, days: int, per_day: int, retention: int):
+    start = main.local_now().date() - datetime.timedelta(days=days)
+    for retention_days in [0, retention]:
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            db = main.DB()
+            seconds = []
+            for day in range(days):
+                date = start + datetime.timedelta(days=day)
+                posts = [
+                    make_post(schema, day * per_day + i, date, rng)
+                    for i in range(per_day)
+                ]
+                started = time.perf_counter()
+                unified_cycle(db, schema, posts[:BATCH], posts)
+                seconds.append(time.perf_counter() - started)
+                db.maintain(retention_days)
+            (rows,) = db.query("SELECT count(*) FROM posts")[0]
+            size, _ = file_size(db)
+            db.close()
+        first = statistics.median(seconds[:30]) * 1000
+        last = statistics.median(seconds[-30:]) * 1000
+        print(
+            f"retention {retention_days or '-':>4}  {days} days x {per_day}  cycle"
+            f" first 30 days {first:.2f} ms, last 30 days {last:.2f} ms"
+            f"  {rows} posts, file {size / 1024:.0f} KiB"
+        )
+
+
+def bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--days", type=int, default=720)
+    parser.add_argument("--per-day", type=int, default=50)
+    parser.add_argument("--retention", type=int, default=180)
+    args = parser.parse_args()
+
+    main.CONFIG.update({"tz": "Asia/Taipei"})
+    schema = main.PostSchema(COLUMNS, "標題", "標題連結", "發布日期", ["標題連結", "發布日期"], "詳細內容")
+    cwd = os.getcwd()
+    try:
+        bench_sizes(schema, list(map(int, args.sizes.split(","))), args.repeat)
+        bench_aging(schema, args.days, args.per_day, args.retention)
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    bench()
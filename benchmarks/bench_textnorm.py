@@ -0,0 +1,82 @@
+"""比較 RSS 項目抽取在改用 textnorm 前後的每筆成本.
+
+python benchmarks/bench_textnorm.py [項目數]
+"""
+import datetime
+import hashlib
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from textnorm import compile_pattern, format_published, strip_tags  # noqa: E402
+
+FILTER_PATTERN = r"羽球|場地|租借"
+FORMAT_IN = "%a, %d %b %Y %H:%M:%S %Z"
+FORMAT_OUT = "%Y/%m/%d"
+
+
+def make_entries(n: int):
+    entries = []
+    for i in range(n):
+        # 約一成的公告與場地租借有關
+        title = f"羽球場地租借公告 {i}" if i % 10 == 0 else f"校園活動公告 {i}"
+        entries.append(
+            {
+                "title": title,
+                "link": f"https://example.tp.edu.tw/news/{i}",
+                "published": f"Wed, {1 + i % 28:02d} Jun 2023 08:00:00 GMT",
+                "description": "<div><p>  公告內容  </p>\n<p>請 參閱 附件</p></div>" * 20,
+            }
+        )
+    return entries
+
+
+def hash_row_data(row):
+    md5 = hashlib.md5()
+    for data in row:
+        md5.update(data.encode("utf-8"))
+    return md5.hexdigest()
+
+
+def extract_before(entries):
+    rss_data = []
+    for entry in entries:
+        title = entry.get("title", "")
+        link = entry.get("link", "")
+        published_str = entry.get("published", "")
+        published = (
+            datetime.datetime.strptime(published_str, FORMAT_IN).strftime(FORMAT_OUT)
+            if published_str != ""
+            else ""
+        )
+        description = re.sub(r"<.*?>|\s+", "", entry.get("description", ""))
+        md5 = hash_row_data([title, link, published, description])
+        rss_data.append([title, link, published, description, md5])
+    return list(filter(lambda x: re.search(FILTER_PATTERN, x[0]), rss_data))
+
+
+def extract_after(entries):
+    filter_regex = compile_pattern(FILTER_PATTERN)
+    rss_data = []
+    for entry in entries:
+        title = entry.get("title", "")
+        if not filter_regex.search(title):
+            continue
+        link = entry.get("link", "")
+        published = format_published(entry.get("published", ""), FORMAT_IN, FORMAT_OUT)
+        description = strip_tags(entry.get("description", ""))
+        md5 = hash_row_data([title, link, published, description])
+        rss_data.append([title, link, published, description, md5])
+    return rss_data
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    entries = make_entries(n)
+    assert extract_before(entries) == extract_after(entries)
+    for name, func in [("before", extract_before), ("after", extract_after)]:
+        seconds = min(timeit.repeat(lambda: func(entries), number=1, repeat=5))
+        print(f"{name:>6}: {seconds / n * 1e6:8.2f} us/entry ({n} entries)")
@@ -0,0 +1,105 @@
+"""把來源目前的回應錄成 benchmarks/fixtures 下的 fixtures.
+
+需要網路與 config.json, 在專案根目錄執行:
+
+python benchmarks/record.py [來源名稱 ...] [--details 3]
+
+html-table 來源會錄列表頁與前幾則公告的詳細內容頁, rss 來源只錄 feed.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+from urllib.parse import urljoin
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import requests  # noqa: E402
+from bs4 import BeautifulSoup, SoupStrainer  # noqa: E402
+
+from main import load_config, load_sources  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def detail_hrefs(page: bytes, source: dict) -> list[str]:
+    """列表頁上每列公告的連結, 以列表頁所在目錄為基準的相對路徑"""
+    soup = BeautifulSoup(
+        page.decode("utf-8"),
+        "html.parser",
+        parse_only=SoupStrainer(
+            "table", {"summary": re.compile(source.get("table_pattern", "場地租借"))}
+        ),
+    )
+    rows = soup.find_all(
+        "tr",
+        {"class": re.compile(source.get("row_class_pattern", "C-tableA2|C-tableA3"))},
+    )
+    base_url = urljoin(source["url"], ".")
+    hrefs = []
+    for tr in rows:
+        a_tag = tr.find("a")
+        if a_tag and a_tag.get("href"):
+            link = urljoin(base_url, a_tag.get("href"))
+            if link.startswith(base_url):
+                hrefs.append(link[len(base_url) :])
+    return hrefs
+
+
+def record(source: dict, session: requests.Session, max_details: int):
+    source_dir = os.path.join(FIXTURES, source["table"])
+    os.makedirs(source_dir, exist_ok=True)
+    r = session.get(source["url"], timeout=30)
+    r.raise_for_status()
+    page = "page.xml" if source["type"] == "rss" else "page.html"
+    with open(os.path.join(source_dir, page), "wb") as f:
+        f.write(r.content)
+    details = {}
+    if source["type"] == "html-table":
+        os.makedirs(os.path.join(source_dir, "details"), exist_ok=True)
+        base_url = urljoin(source["url"], ".")
+        for i, href in enumerate(detail_hrefs(r.content, source)[:max_details]):
+            detail = session.get(urljoin(base_url, href), timeout=30)
+            detail.raise_for_status()
+            path = f"details/{i}.html"
+            with open(os.path.join(source_dir, path), "wb") as f:
+                f.write(detail.content)
+            details[href] = path
+    manifest = {
+        key: source[key]
+        for key in (
+            "name",
+            "type",
+            "table",
+            "url",
+            "row_class_pattern",
+            "table_pattern",
+        )
+        if key in source
+    }
+    manifest.update(
+        page=page,
+        details=details,
+        recorded_at=datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    )
+    with open(os.path.join(source_dir, "source.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"{source['name']}: {len(r.content)} bytes, {len(details)} 則詳細內容")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sources", nargs="*", help="預設錄全部來源")
+    parser.add_argument("--details", type=int, default=3, help="每個來源錄幾則詳細內容")
+    args = parser.parse_args()
+    load_config()
+    sources = load_sources()
+    session = requests.Session()
+    for name in args.sources or list(sources):
+        record(sources[name], session, args.details)
+
+
+if __name__ == "__main__":
+    main()
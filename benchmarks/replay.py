@@ -0,0 +1,208 @@
+"""離線重播錄好的 fixtures, 供 benchmark 使用.
+
+ReplayServer 在本機同時扮演三個學校網站、reurl、Line 與 Discord API,
+feed 可以放大成 N 倍 (複製表格列 / RSS 項目並改寫連結), 不需要網路.
+
+bench_env() 會在暫存目錄寫入指向 ReplayServer 的 config.json 並切換過去,
+bcdb.db 也建在暫存目錄, 不會動到正式的資料庫.
+"""
+import http.server
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+from urllib.parse import unquote
+import zlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+ITEM = re.compile(r"<item>.*?</item>", re.S)
+RSS_LINK = re.compile(r"(<link>|<guid[^>]*>)(.*?)(</link>|</guid>)", re.S)
+HREF = re.compile(r'href="([^"]*)"')
+BENCH_PARAM = re.compile(r"[?&]bench=\d+")
+
+
+def load_fixtures(fixtures_dir: str = FIXTURES) -> dict[str, dict]:
+    """讀取每個來源的 source.json 與頁面內容, 以資料表名稱為 key"""
+    fixtures = {}
+    for table in sorted(os.listdir(fixtures_dir)):
+        source_dir = os.path.join(fixtures_dir, table)
+        manifest = os.path.join(source_dir, "source.json")
+        if not os.path.isfile(manifest):
+            continue
+        with open(manifest, encoding="utf-8") as f:
+            fixture = json.load(f)
+        with open(os.path.join(source_dir, fixture["page"]), "rb") as f:
+            fixture["page_content"] = f.read()
+        fixture["detail_contents"] = {}
+        for href, path in fixture["details"].items():
+            with open(os.path.join(source_dir, path), "rb") as f:
+                fixture["detail_contents"][href] = f.read()
+        fixtures[table] = fixture
+    return fixtures
+
+
+def with_bench_param(link: str, k: int) -> str:
+    if k == 0:
+        return link
+    return f"{link}{'&' if '?' in link else '?'}bench={k}"
+
+
+def scale_rows(text: str, pattern: re.Pattern, rewrite, factor: int) -> str:
+    """把所有符合 pattern 的區塊複製 factor 份, 第 k 份以 rewrite(block, k) 改寫"""
+    blocks = list(pattern.finditer(text))
+    if not blocks or factor <= 1:
+        return text
+    start, end = blocks[0].start(), blocks[-1].end()
+    original = [block.group(0) for block in blocks]
+    copies = [rewrite(block, k) for k in range(factor) for block in original]
+    return text[:start] + "\n".join(copies) + text[end:]
+
+
+def scale_html(page: bytes, factor: int, row_class_pattern: str) -> bytes:
+    row = re.compile(
+        rf'<tr[^>]*class="[^"]*(?:{row_class_pattern})[^"]*"[^>]*>.*?</tr>', re.S
+    )
+
+    def rewrite(block: str, k: int):
+        return HREF.sub(lambda m: f'href="{with_bench_param(m.group(1), k)}"', block)
+
+    return scale_rows(page.decode("utf-8"), row, rewrite, factor).encode("utf-8")
+
+
+def scale_rss(page: bytes, factor: int) -> bytes:
+    def rewrite(block: str, k: int):
+        return RSS_LINK.sub(
+            lambda m: m.group(1) + with_bench_param(m.group(2), k) + m.group(3),
+            block,
+        )
+
+    return scale_rows(page.decode("utf-8"), ITEM, rewrite, factor).encode("utf-8")
+
+
+class ReplayHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 標頭與內容分兩次寫出, 不關掉 Nagle 每個回應都會多等一次 delayed ACK
+    disable_nagle_algorithm = True
+
+    def reply(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server: ReplayServer = self.server
+        server.count("GET")
+        table, _, rest = self.path.lstrip("/").partition("/")
+        fixture = server.fixtures.get(table)
+        if fixture is None:
+            return self.reply(404, b"not found", "text/plain")
+        if rest == "page":
+            return self.reply(200, server.page(table), "text/html; charset=utf-8")
+        details = fixture["detail_contents"]
+        # 放大後的列表連結帶有 bench 參數, 沒錄到的詳細頁以第一頁代替
+        detail = details.get(BENCH_PARAM.sub("", unquote(rest))) or next(
+            iter(details.values())
+        )
+        self.reply(200, detail, "text/html; charset=utf-8")
+
+    def do_POST(self):
+        server: ReplayServer = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/reurl":
+            server.count("reurl")
+            url = json.loads(body)["url"]
+            short_url = f"https://reurl.cc/{zlib.crc32(url.encode()):08x}"
+            return self.reply(
+                200, json.dumps({"short_url": short_url}).encode(), "application/json"
+            )
+        if self.path.startswith("/line/"):
+            server.count("line")
+        elif self.path.startswith("/discord/"):
+            server.count("discord")
+        self.reply(200, b"{}", "application/json")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fixtures: dict[str, dict], factor: int = 1):
+        super().__init__(("127.0.0.1", 0), ReplayHandler)
+        self.fixtures = fixtures
+        self.factor = factor
+        # 大於 0 時在列表頁 / feed 尾端加上註解, 內容變動但公告都沒變
+        self.revision = 0
+        self.pages: dict[tuple, bytes] = {}
+        self.counts: dict[str, int] = {}
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count(self, kind: str):
+        with self.lock:
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+
+    def page(self, table: str, factor: int = None) -> bytes:
+        factor = self.factor if factor is None else factor
+        key = (table, factor, self.revision)
+        if key not in self.pages:
+            fixture = self.fixtures[table]
+            if fixture["type"] == "rss":
+                page = scale_rss(fixture["page_content"], factor)
+            else:
+                page = scale_html(
+                    fixture["page_content"],
+                    factor,
+                    fixture.get("row_class_pattern", "C-tableA2|C-tableA3"),
+                )
+            if self.revision:
+                page += f"\n<!-- revision {self.revision} -->".encode("utf-8")
+            self.pages[key] = page
+        return self.pages[key]
+
+    def source(self, table: str) -> dict:
+        """指向重播伺服器的來源設定"""
+        fixture = self.fixtures[table]
+        keys = ("name", "type", "table", "row_class_pattern", "table_pattern")
+        source = {key: fixture[key] for key in keys if key in fixture}
+        source["url"] = f"{self.base}/{table}/page"
+        return source
+
+
+def bench_env(server: ReplayServer, config: dict = None) -> str:
+    """建立暫存工作目錄並切換過去, 之後 main.load_config() 會讀到這裡的 config.json"""
+    workdir = tempfile.mkdtemp(prefix="bcfinder-bench-")
+    shutil.copy(os.path.join(ROOT, "line_flex_message_template.json"), workdir)
+    bench_config = {
+        "line_admin_id": "admin",
+        "line_group_chat_id": "group",
+        "line_channel_access_token": "token",
+        "line_channel_secret": "secret",
+        "line_api_endpoint": f"{server.base}/line",
+        "discord_token": "token",
+        "discord_api_base": f"{server.base}/discord",
+        "reurl_post_uri": f"{server.base}/reurl",
+        "reurl_api_key": "key",
+        "tz": "Asia/Taipei",
+        "default_schedule_job_interval": 3600,
+        "notify_batch_wait": 0.05,
+        "sources": [server.source(table) for table in server.fixtures],
+        **(config or {}),
+    }
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(bench_config, f, ensure_ascii=False)
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    return workdir
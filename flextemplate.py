@@ -0,0 +1,48 @@
+"""Flex Message 範本編譯: 範本只序列化一次, 渲染時只把值填進預先切好的片段."""
+import copy
+import json
+import re
+
+SLOT = "__bcfinder_slot_{}__"
+SLOT_PATTERN = re.compile(r'"__bcfinder_slot_(\d+)__"')
+# Line 的 carousel 最多 12 個 bubble
+MAX_CAROUSEL_SIZE = 12
+
+
+class FlexTemplate:
+    """把 JSON 範本中 slots 指定路徑的值換成插槽
+
+    slots 是 {名稱: 路徑}, 路徑為 dict key 與 list index 組成的 tuple.
+    每次 render 都會產生新的 JSON 字串, 解析出來的 dict 彼此獨立, 不共用範本.
+    """
+
+    def __init__(self, template: dict, slots: dict[str, tuple]) -> None:
+        marked = copy.deepcopy(template)
+        self.names = list(slots)
+        for i, path in enumerate(slots.values()):
+            node = marked
+            for key in path[:-1]:
+                node = node[key]
+            node[path[-1]] = SLOT.format(i)
+        # 切成 [片段, 插槽, 片段, 插槽, ..., 片段]
+        parts = SLOT_PATTERN.split(
+            json.dumps(marked, ensure_ascii=False, separators=(",", ":"))
+        )
+        self.fragments: list[str] = parts[0::2]
+        self.slot_order: list[str] = [self.names[int(i)] for i in parts[1::2]]
+
+    def render_json(self, **values) -> str:
+        out = [self.fragments[0]]
+        for name, fragment in zip(self.slot_order, self.fragments[1:]):
+            out.append(json.dumps(str(values[name]), ensure_ascii=False))
+            out.append(fragment)
+        return "".join(out)
+
+    def render(self, **values) -> dict:
+        return json.loads(self.render_json(**values))
+
+
+def carousel(bubbles: list[dict]) -> dict:
+    if len(bubbles) > MAX_CAROUSEL_SIZE:
+        raise ValueError(f"carousel 最多 {MAX_CAROUSEL_SIZE} 個 bubble")
+    return {"type": "carousel", "contents": bubbles}
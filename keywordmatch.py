@@ -0,0 +1,52 @@
+"""多組關鍵字的單次比對: 所有關鍵字合併成一個以 trie 排列的 regex.
+
+regex 包在 lookahead 裡, 每個位置都會回報從該處開始最長的關鍵字, 被它包含的
+較短關鍵字在建立時就併進它的擁有者, 因此一次 finditer 就能找出所有符合的組別,
+比對成本只跟文字長度有關, 不會隨組數增加.
+"""
+import re
+
+
+def trie_pattern(words) -> str:
+    """把關鍵字排成 trie 形狀的 regex, 相同前綴只比對一次, 同一位置優先取最長的"""
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in node.items() if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # 關鍵字可以在這裡結束, 後面的字元變成可有可無
+        if "" in node:
+            body = f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """keywords 是 {關鍵字: 擁有者}, match 回傳文字中出現的關鍵字的擁有者集合"""
+
+    def __init__(self, keywords: dict[str, set]) -> None:
+        words = [word for word in keywords if word]
+        # 關鍵字中包含的較短關鍵字, 它們的擁有者也算符合
+        self.owners: dict[str, frozenset] = {
+            word: frozenset().union(
+                *(keywords[other] for other in words if other in word)
+            )
+            for word in words
+        }
+        self.regex = re.compile(f"(?=({trie_pattern(words)}))") if words else None
+
+    def match(self, text: str) -> set:
+        found = set()
+        if self.regex is None:
+            return found
+        for m in self.regex.finditer(text):
+            found |= self.owners[m.group(1)]
+        return found
@@ -1,130 +1,1093 @@
-import asyncio
-from bs4 import BeautifulSoup
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import atexit
+import calendar
+import collections
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import datetime
-import discord
-import feedparser
+from flextemplate import MAX_CAROUSEL_SIZE, FlexTemplate, carousel
 import json
+from keywordmatch import KeywordMatcher
 import hashlib
-from linebot import LineBotApi, WebhookHandler
-from linebot.models import TextSendMessage, FlexSendMessage
+import heapq
+import html
+import io
 from loguru import logger
-import pytz
+import math
+import operator
+import os
 import platform
-import requests
+import queue
+import random
 import re
-import schedule
+import signal
 import sys
 import sqlite3
+from textnorm import (
+    compile_pattern,
+    format_published,
+    normalize_date,
+    strip_tags,
+    strip_whitespace,
+)
+import threading
 import time
 import traceback
-from typing import Union, Literal, Optional
+from typing import TYPE_CHECKING, Union, Optional
 from urllib.parse import urljoin
+import zlib
+
+# 平台 SDK 與解析器在建立需要它們的 worker 時才載入, 見 benchmarks/bench_startup.py
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    import aiohttp
+    import asyncio
+    from bs4 import BeautifulSoup
+    import requests
 
 system = platform.system()
 
-with open("config.json") as f:
-    c = f.read()
-    CONFIG = json.loads(c)
+CONFIG: dict = {}
+
+
+def load_config(path: str = "config.json") -> dict:
+    """讀取設定檔, 沿用同一個 CONFIG dict, 其他模組 import 的參照也會看到新設定"""
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    CONFIG.clear()
+    CONFIG.update(config)
+    return CONFIG
+
+
+def local_now():
+    import pytz
+
+    return datetime.datetime.now(pytz.timezone(CONFIG.get("tz")))
+
 
 logger.remove(0)
 logger.add(sys.stderr, level="INFO")
 
 
+### metrics ###
+class Metrics:
+    """計數器與耗時統計, 以 Prometheus 文字格式寫到檔案或從 HTTP endpoint 提供"""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.counters: dict[tuple, float] = {}
+        # (name, labels) -> [總秒數, 次數]
+        self.summaries: dict[tuple, list] = {}
+
+    def key(self, name: str, labels: dict):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, count: int = 1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            summary = self.summaries.setdefault(key, [0.0, 0])
+            summary[0] += seconds
+            summary[1] += count
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def drain(self) -> dict:
+        """取出並清空目前的統計, 用來把子 process 的數字交回主 process"""
+        with self.lock:
+            data = {"counters": self.counters, "summaries": self.summaries}
+            self.counters, self.summaries = {}, {}
+        return data
+
+    def merge(self, data: dict):
+        with self.lock:
+            for key, value in data["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (seconds, count) in data["summaries"].items():
+                summary = self.summaries.setdefault(key, [0.0, 0])
+                summary[0] += seconds
+                summary[1] += count
+
+    def format_labels(self, labels: tuple):
+        if not labels:
+            return ""
+        escaped = (
+            (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for k, v in labels
+        )
+        return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted(self.summaries.items())
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{self.format_labels(labels)} {value}")
+        for (name, labels), (seconds, count) in summaries:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} summary")
+            lines.append(f"{name}_sum{self.format_labels(labels)} {seconds:.6f}")
+            lines.append(f"{name}_count{self.format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        # 先寫暫存檔再換名, 讀取端不會看到寫到一半的檔案
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = "0.0.0.0"):
+        import http.server
+
+        metrics = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Metrics endpoint: http://{host}:{port}/metrics")
+        return server
+
+
+METRICS = Metrics()
+
+
+### records ###
+def identity_hash(values) -> str:
+    """以識別欄位的值計算公告的識別碼 (blake2b, 8 bytes)"""
+    # 等同逐欄 update(value) 再 update(b"\x1f"), 已存的識別碼不必重算
+    data = "\x1f".join(values).encode("utf-8") + b"\x1f"
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+class Post(tuple):
+    """一則公告, 寫入 posts 表時由 PostSchema.record 轉換
+
+    依 PostSchema.row_columns 排列, 前四欄固定是標題、連結、發布日期與識別碼,
+    送出通知時不必用欄位名稱查位置.
+    """
+
+    __slots__ = ()
+
+    title = property(operator.itemgetter(0))
+    link = property(operator.itemgetter(1))
+    published = property(operator.itemgetter(2))
+    md5 = property(operator.itemgetter(3))
+
+
+class PostSchema:
+    """來源的欄位配置, 欄位名稱只在建立 worker 時換算成位置一次"""
+
+    __slots__ = ("row_columns", "index", "identity", "body", "extra")
+
+    def __init__(
+        self,
+        columns: list,
+        title_label: str,
+        link_label: str,
+        published_label: str,
+        identity_keys: list,
+        body_label: Optional[str] = None,
+    ) -> None:
+        fixed = (title_label, link_label, published_label, "md5")
+        self.row_columns: tuple = fixed + tuple(
+            col for col in columns if col not in fixed
+        )
+        self.index: dict[str, int] = {col: i for i, col in enumerate(self.row_columns)}
+        self.identity: tuple = tuple(self.index[key] for key in identity_keys)
+        # 內文存在 posts.body, 其餘欄位以 JSON 存在 posts.extra
+        self.body: Optional[int] = self.index.get(body_label)
+        self.extra: tuple = tuple(
+            (col, i)
+            for i, col in enumerate(self.row_columns)
+            if i > 3 and i != self.body
+        )
+
+    def empty(self) -> list:
+        return [""] * len(self.row_columns)
+
+    def identity_hash(self, values) -> str:
+        return identity_hash([values[i] for i in self.identity])
+
+    def post(self, values: list) -> Post:
+        """values 依 row_columns 排列, 算出識別碼後轉成 Post"""
+        values[3] = identity_hash([values[i] for i in self.identity])
+        return Post(values)
+
+    def record(self, post: Post) -> tuple:
+        """寫入 posts 表的 (md5, 標題, 連結, 發布日期, 內文, 其餘欄位的 JSON)"""
+        body = "" if self.body is None else post[self.body]
+        extra = (
+            json.dumps(
+                {col: post[i] for col, i in self.extra},
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            if self.extra
+            else None
+        )
+        return (post.md5, post.title, post.link, post.published, body, extra)
+
+    def values(self, title, link, published, body, extra) -> list:
+        """record 的反向, 從 posts 表讀出的欄位還原成依 row_columns 排列的值"""
+        values = self.empty()
+        values[0:3] = title or "", link or "", published or ""
+        if self.body is not None:
+            values[self.body] = body or ""
+        fields = json.loads(extra) if extra else {}
+        for col, i in self.extra:
+            values[i] = fields.get(col) or ""
+        return values
+
+
 ### database worker ###
+# PostSchema.record 中可以用來去重的欄位位置
+RECORD_FIELDS = {"md5": 0, "link": 2}
+
+
+def deflate_body(text: str, threshold: int) -> Union[str, bytes]:
+    """至少 threshold bytes 的內文以 zlib 壓縮成 BLOB, 較短的維持 TEXT"""
+    data = text.encode("utf-8")
+    if threshold <= 0 or len(data) < threshold:
+        return text
+    packed = zlib.compress(data)
+    return packed if len(packed) < len(data) else text
+
+
+def inflate_body(value) -> str:
+    """deflate_body 的反向, 在 SQL 中註冊為 inflate()"""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value or ""
+
+
+class SeenFilter:
+    """已看過的值的 Bloom filter, 加上最近插入值的精確集合
+
+    Bloom filter 的大小只由 capacity 決定, 歷史資料再多記憶體也不會成長,
+    只是誤判率變高, 誤判的值會再回頭查 SQLite.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, recent_size: int) -> None:
+        self.num_bits = max(
+            8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.recent: collections.OrderedDict = collections.OrderedDict()
+        self.recent_size = recent_size
+
+    def positions(self, value: str):
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, value: str):
+        for pos in self.positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.recent[value] = None
+        self.recent.move_to_end(value)
+        if len(self.recent) > self.recent_size:
+            self.recent.popitem(last=False)
+
+    def might_contain(self, value: str):
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self.positions(value)
+        )
+
+    def is_recent(self, value: str):
+        return value in self.recent
+
+    def discard(self, value: str):
+        # Bloom filter 無法刪除, 只從 recent 移除, 之後再看到時會回頭查 SQLite
+        self.recent.pop(value, None)
+
+
 class DB:
     def __init__(self) -> None:
         self.db_name = "bcdb.db"
+        # 整個 process 共用一條連線, 以 lock 保護跨 thread 的存取
+        self.lock = threading.RLock()
+        self.transaction_depth = 0
+        self.con = self.connect()
+        # (source, "md5" 或 "link") -> SeenFilter, 第一次查詢時才從資料表載入
+        self.seen_filters: dict[tuple[str, str], SeenFilter] = {}
+        # 子 process 的連線只讀, 看不到主 process 之後寫入的公告, 不能用 seen_filters 判斷
+        self.use_seen_filters = True
+        # transaction 中插入的公告, commit 後才加進 seen_filters
+        self.pending_seen: list[tuple[str, list]] = []
+        # 沒有 FTS5 trigram (SQLite < 3.34) 時一律以 LIKE 搜尋
+        self.fts = True
+        self.body_compress_threshold: int = CONFIG.get("body_compress_threshold", 512)
         self.init_db()
 
+    def connect(self):
+        con = sqlite3.connect(
+            self.db_name, check_same_thread=False, isolation_level=None
+        )
+        con.execute(f"PRAGMA journal_mode={CONFIG.get('db_journal_mode', 'WAL')}")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute(f"PRAGMA cache_size={CONFIG.get('db_cache_size', -8000)}")
+        con.execute(f"PRAGMA mmap_size={CONFIG.get('db_mmap_size', 67108864)}")
+        con.execute("PRAGMA temp_store=MEMORY")
+        con.create_function("inflate", 1, inflate_body, deterministic=True)
+        return con
+
+    def close(self):
+        with self.lock:
+            self.con.close()
+
+    @contextlib.contextmanager
+    def cursor(self, op: str = "query"):
+        with self.lock, contextlib.closing(self.con.cursor()) as cur:
+            with METRICS.timer("bcfinder_db_seconds", op=op):
+                yield cur
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """巢狀的 transaction 只在最外層 commit, 一個 cycle 只需一次 fsync"""
+        with self.lock:
+            if self.transaction_depth == 0:
+                self.con.execute("BEGIN")
+                started = time.perf_counter()
+            self.transaction_depth += 1
+            try:
+                yield self.con
+            except BaseException:
+                self.transaction_depth -= 1
+                if self.transaction_depth == 0:
+                    self.con.execute("ROLLBACK")
+                    self.pending_seen.clear()
+                raise
+            else:
+                self.transaction_depth -= 1
+                if self.transaction_depth == 0:
+                    self.con.execute("COMMIT")
+                    METRICS.observe(
+                        "bcfinder_db_seconds",
+                        time.perf_counter() - started,
+                        op="transaction",
+                    )
+                    for source, records in self.pending_seen:
+                        self.remember(source, records)
+                    self.pending_seen.clear()
+
+    def checkpoint(self):
+        # bcdb.db 是單檔 bind mount, 把 WAL 寫回主檔以免容器重建時遺失
+        with self.cursor(op="checkpoint") as cur:
+            cur.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
     def init_db(self):
-        # 中山國中
-        q = """CREATE TABLE IF NOT EXISTS zsjhs
+        # 既有的資料庫要 VACUUM 一次才會改成 incremental, 之後由 maintain 定期歸還空頁
+        with self.cursor() as cur:
+            (auto_vacuum,) = cur.execute("PRAGMA auto_vacuum").fetchone()
+        if auto_vacuum != 2:
+            self.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            self.execute("VACUUM")
+        # 所有來源的公告, 舊版各來源各一張的資料表由 migrate_table 搬進來
+        q = """CREATE TABLE IF NOT EXISTS posts
+            (
+                source VARCHAR(100),
+                md5 VARCHAR(16),
+                title TEXT,
+                link TEXT,
+                published VARCHAR(20),
+                published_on DATE,
+                body TEXT,
+                extra TEXT,
+                created_at INTEGER,
+                PRIMARY KEY (source, md5)
+            );
+        """
+        self.execute(q)
+        self.execute("CREATE INDEX IF NOT EXISTS posts_link ON posts (source, link);")
+        self.execute(
+            "CREATE INDEX IF NOT EXISTS posts_published ON posts (published_on);"
+        )
+        # HTTP 驗證快取 (ETag / Last-Modified / 內容 md5)
+        q = """CREATE TABLE IF NOT EXISTS http_cache
             (
-                序號 VARCHAR(10),
-                標題 VARCHAR(100),
-                標題連結 VARCHAR(100),
-                發布單位 VARCHAR(20),
-                發布日期 VARCHAR(10),
-                詳細內容 TEXT,
-                相關連結 VARCHAR(10),
-                相關檔案 VARCHAR(10),
-                md5 VARCHAR(10) PRIMARY KEY
+                url VARCHAR(200) PRIMARY KEY,
+                etag VARCHAR(100),
+                last_modified VARCHAR(50),
+                body_md5 VARCHAR(32)
             );
         """
         self.execute(q)
-        # 玉成國小
-        q = """CREATE TABLE IF NOT EXISTS yhes
+        # 短網址快取
+        q = """CREATE TABLE IF NOT EXISTS short_urls
             (
-                title VARCHAR(100),
-                link VARCHAR(100),
-                published VARCHAR(20),
-                description TEXT,
-                md5 VARCHAR(10) PRIMARY KEY
+                url VARCHAR(200) PRIMARY KEY,
+                short_url VARCHAR(100),
+                created_at INTEGER,
+                last_used INTEGER
             );
         """
         self.execute(q)
-        # 三民國中
-        q = """CREATE TABLE IF NOT EXISTS smjh
+        # 原始頁面 / feed 快照, 以內容的 sha256 定址, 相同內容只存一份
+        q = """CREATE TABLE IF NOT EXISTS snapshots
             (
-                title VARCHAR(100),
-                link VARCHAR(100),
-                published VARCHAR(20),
-                description TEXT,
-                md5 VARCHAR(10) PRIMARY KEY
+                digest VARCHAR(64) PRIMARY KEY,
+                data BLOB,
+                size INTEGER
+            );
+        """
+        self.execute(q)
+        q = """CREATE TABLE IF NOT EXISTS source_snapshots
+            (
+                source VARCHAR(100),
+                digest VARCHAR(64),
+                fetched_at INTEGER
+            );
+        """
+        self.execute(q)
+        self.execute(
+            "CREATE INDEX IF NOT EXISTS source_snapshots_source ON source_snapshots (source, fetched_at);"
+        )
+        # 各來源目前 md5 欄位所用的識別欄位
+        q = """CREATE TABLE IF NOT EXISTS identity_migrations
+            (
+                tbname VARCHAR(100) PRIMARY KEY,
+                identity_keys VARCHAR(200)
+            );
+        """
+        self.execute(q)
+        # 各 RSS 來源處理過的最新發布時間 (UTC epoch 秒)
+        q = """CREATE TABLE IF NOT EXISTS feed_state
+            (
+                source VARCHAR(100) PRIMARY KEY,
+                high_water INTEGER
             );
         """
         self.execute(q)
+        # 標題與內文的全文檢索, rowid 與 posts 相同; contentless, 內文只存在 posts
+        try:
+            self.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS post_search USING fts5(title, body, content='', tokenize='trigram');"
+            )
+        except sqlite3.OperationalError as e:
+            logger.warning(f"無法建立全文檢索索引, 搜尋改用 LIKE: {e}")
+            self.fts = False
+        if self.fts:
+            # 寫入時合併索引片段的成本會隨索引變大, 改由 maintain 定期合併
+            with self.cursor() as cur:
+                cur.execute("SELECT 1 FROM post_search_config WHERE k = 'automerge'")
+                configured = cur.fetchone() is not None
+            if not configured:
+                self.execute(
+                    "INSERT INTO post_search (post_search, rank) VALUES ('automerge', 0)"
+                )
 
     def execute(self, sql: str):
-        with contextlib.closing(
-            sqlite3.connect(self.db_name)
-        ) as con, con, contextlib.closing(con.cursor()) as cur:
+        with self.cursor() as cur:
             cur.execute(sql)
 
     def query(self, sql: str):
-        with contextlib.closing(
-            sqlite3.connect(self.db_name)
-        ) as con, con, contextlib.closing(con.cursor()) as cur:
+        with self.cursor() as cur:
             cur.execute(sql)
             return cur.fetchall()
 
-    def exist(self, cols, row, tbname: str, index_label: str):
-        with contextlib.closing(
-            sqlite3.connect(self.db_name)
-        ) as con, con, contextlib.closing(con.cursor()) as cur:
-            md5_index = cols.index("md5")
-            md5 = row[md5_index]
-            query = f"SELECT COUNT(*) FROM {tbname} WHERE {index_label} = ?"
-            cur.execute(query, (md5,))
-            result = cur.fetchone()[0]
-            return result > 0
-
-    def insert(self, cols, row, tbname: str):
-        with contextlib.closing(
-            sqlite3.connect(self.db_name)
-        ) as con, con, contextlib.closing(con.cursor()) as cur:
+    def get_validators(self, url: str):
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT etag, last_modified, body_md5 FROM http_cache WHERE url = ?",
+                (url,),
+            )
+            return cur.fetchone()
+
+    def set_validators(
+        self,
+        url: str,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        body_md5: str,
+    ):
+        with self.cursor() as cur:
             cur.execute(
-                f"INSERT INTO {tbname} VALUES({','.join(['?' for i in range(len(cols))])})",
-                row,
+                "INSERT OR REPLACE INTO http_cache VALUES(?,?,?,?)",
+                (url, etag, last_modified, body_md5),
             )
 
+    def get_high_water(self, source: str) -> Optional[int]:
+        with self.cursor() as cur:
+            cur.execute("SELECT high_water FROM feed_state WHERE source = ?", (source,))
+            result = cur.fetchone()
+            return result[0] if result else None
+
+    def set_high_water(self, source: str, high_water: int):
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO feed_state VALUES(?,?)", (source, high_water)
+            )
+
+    def latest_posts(self, source: str, limit: int) -> list[tuple]:
+        """來源最近寫入的 limit 則公告 (標題, 連結, 發布日期), 新的在前"""
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT title, link, published FROM posts WHERE source = ? ORDER BY rowid DESC LIMIT ?",
+                (source, limit),
+            )
+            return cur.fetchall()
+
+    def search(
+        self,
+        days: Optional[int] = None,
+        keyword: str = "",
+        sources: Optional[list] = None,
+        limit: int = 20,
+    ) -> list[tuple]:
+        """最近 days 天內標題或內文包含 keyword 的公告, 新的在前
+
+        回傳 (source, 標題, 連結, 發布日期). keyword 至少 3 個字時走 trigram 索引,
+        較短時 (例如「羽球」) 先以發布日期的索引縮小範圍再用 LIKE 比對.
+        """
+        where = []
+        params: list = []
+        if days is not None:
+            since = local_now().date() - datetime.timedelta(days=days)
+            where.append("p.published_on >= ?")
+            params.append(since.isoformat())
+        if sources:
+            where.append(f"p.source IN ({','.join(['?' for _ in sources])})")
+            params += sources
+        tables = "posts p"
+        if keyword:
+            if self.fts and len(keyword) >= 3:
+                tables = "post_search s JOIN posts p ON p.rowid = s.rowid"
+                where.append("post_search MATCH ?")
+                params.append('"' + keyword.replace('"', '""') + '"')
+            else:
+                # 依發布日期的索引由新到舊找, 湊滿 limit 筆就停; 標題不符時才解壓內文
+                like = "%" + re.sub(r"([\\%_])", r"\\\1", keyword) + "%"
+                where.append(
+                    "(p.title LIKE ? ESCAPE '\\' OR inflate(p.body) LIKE ? ESCAPE '\\')"
+                )
+                params += [like, like]
+        sql = f"SELECT p.source, p.title, p.link, p.published_on FROM {tables}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY p.published_on DESC, p.rowid DESC LIMIT ?"
+        params.append(limit)
+        with self.cursor(op="search") as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
+
+    def get_short_urls(self, urls: list, ttl: int) -> dict:
+        now = int(time.time())
+        short_urls = {}
+        with self.transaction() as con:
+            for i in range(0, len(urls), 500):
+                chunk = urls[i : i + 500]
+                cur = con.execute(
+                    f"SELECT url, short_url FROM short_urls WHERE created_at > ? AND url IN ({','.join(['?' for _ in chunk])})",
+                    [now - ttl, *chunk],
+                )
+                short_urls.update(cur.fetchall())
+            con.executemany(
+                "UPDATE short_urls SET last_used = ? WHERE url = ?",
+                [(now, url) for url in short_urls],
+            )
+        return short_urls
+
+    def set_short_urls(self, short_urls: dict, ttl: int, max_size: int):
+        now = int(time.time())
+        with self.transaction() as con:
+            con.executemany(
+                "INSERT OR REPLACE INTO short_urls VALUES(?,?,?,?)",
+                [(url, short_url, now, now) for url, short_url in short_urls.items()],
+            )
+            # 過期的與最久沒用到的短網址移出快取
+            con.execute("DELETE FROM short_urls WHERE created_at <= ?", (now - ttl,))
+            con.execute(
+                "DELETE FROM short_urls WHERE url NOT IN (SELECT url FROM short_urls ORDER BY last_used DESC LIMIT ?)",
+                (max_size,),
+            )
+
+    def latest_snapshot(self, source: str) -> Optional[bytes]:
+        with self.cursor() as cur:
+            cur.execute(
+                """SELECT s.data FROM source_snapshots ss
+                JOIN snapshots s ON s.digest = ss.digest
+                WHERE ss.source = ? ORDER BY ss.fetched_at DESC, ss.rowid DESC LIMIT 1""",
+                (source,),
+            )
+            result = cur.fetchone()
+            return zlib.decompress(result[0]) if result else None
+
+    def save_snapshot(self, source: str, content: bytes, retention: int):
+        digest = hashlib.sha256(content).hexdigest()
+        with self.transaction() as con:
+            con.execute(
+                "INSERT OR IGNORE INTO snapshots VALUES(?,?,?)",
+                (digest, zlib.compress(content), len(content)),
+            )
+            con.execute(
+                "INSERT INTO source_snapshots VALUES(?,?,?)",
+                (source, digest, int(time.time())),
+            )
+            # 每個來源只保留最近 retention 份, 沒有被參照的內容一併刪除
+            con.execute(
+                """DELETE FROM source_snapshots WHERE source = ? AND rowid NOT IN
+                (SELECT rowid FROM source_snapshots WHERE source = ?
+                ORDER BY fetched_at DESC, rowid DESC LIMIT ?)""",
+                (source, source, retention),
+            )
+            con.execute(
+                "DELETE FROM snapshots WHERE digest NOT IN (SELECT digest FROM source_snapshots)"
+            )
+        return digest
+
+    def migrate_table(self, tbname: str, schema: PostSchema):
+        """把舊版各來源各一張的資料表搬進 posts, 搬完後刪除
+
+        舊表的欄位名稱 (中文或英文) 依來源的 schema 對應, 識別碼沿用舊表的 md5 欄位.
+        """
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (tbname,),
+            )
+            if cur.fetchone() is None:
+                return
+        with self.transaction() as con:
+            cur = con.execute(f"SELECT * FROM {tbname} ORDER BY rowid")
+            names = [d[0] for d in cur.description]
+            # 只搬舊版的公告表, 來源名稱撞到其他資料表時不動它
+            if "md5" not in names or "source" in names:
+                return
+            index = [schema.index.get(name) for name in names]
+            posts = []
+            for row in cur:
+                values = schema.empty()
+                for i, value in zip(index, row):
+                    if i is not None:
+                        values[i] = value or ""
+                posts.append(Post(values))
+            new_md5s = self.filter_new(tbname, [post.md5 for post in posts])
+            self.insert_posts(
+                tbname, [schema.record(post) for post in posts if post.md5 in new_md5s]
+            )
+            con.execute(f"DROP TABLE {tbname}")
+        logger.info(f"{tbname} 的 {len(posts)} 則公告已搬到 posts 表")
+
+    def migrate_identity(self, source: str, identity_keys: list, schema: PostSchema):
+        """identity_keys 改變時重新計算來源既有公告的 md5 欄位, 重複的只保留最新一筆"""
+        keys = ",".join(identity_keys)
+        with self.transaction() as con:
+            result = con.execute(
+                "SELECT identity_keys FROM identity_migrations WHERE tbname = ?",
+                (source,),
+            ).fetchone()
+            if result and result[0] == keys:
+                return
+            rows = con.execute(
+                "SELECT rowid, title, link, published, inflate(body), extra FROM posts WHERE source = ? ORDER BY rowid DESC",
+                (source,),
+            ).fetchall()
+            seen = set()
+            updates = []
+            deletes = []
+            for rowid, *stored in rows:
+                h = schema.identity_hash(schema.values(*stored))
+                if h in seen:
+                    deletes.append((rowid,))
+                else:
+                    seen.add(h)
+                    updates.append((h, rowid))
+            self.delete_posts(con, "rowid = ?", deletes)
+            # 先換成暫時的值, 避免更新途中撞到 PRIMARY KEY
+            con.execute(
+                "UPDATE posts SET md5 = '#' || rowid WHERE source = ?", (source,)
+            )
+            con.executemany("UPDATE posts SET md5 = ? WHERE rowid = ?", updates)
+            con.execute(
+                "INSERT OR REPLACE INTO identity_migrations VALUES(?,?)", (source, keys)
+            )
+            if rows:
+                logger.info(
+                    f"{source} 改用 ({keys}) 作為識別碼: 更新 {len(updates)} 筆, 移除重複 {len(deletes)} 筆"
+                )
+        with self.lock:
+            for key in list(self.seen_filters):
+                if key[0] == source:
+                    del self.seen_filters[key]
+
+    def get_seen_filter(self, source: str, label: str):
+        with self.lock:
+            if (source, label) not in self.seen_filters:
+                seen_filter = SeenFilter(
+                    capacity=CONFIG.get("seen_filter_capacity", 100000),
+                    error_rate=CONFIG.get("seen_filter_error_rate", 0.001),
+                    recent_size=CONFIG.get("seen_filter_recent_size", 2000),
+                )
+                with self.cursor() as cur:
+                    cur.execute(
+                        f"SELECT {label} FROM posts WHERE source = ? ORDER BY rowid",
+                        (source,),
+                    )
+                    for (value,) in cur:
+                        seen_filter.add(value)
+                self.seen_filters[(source, label)] = seen_filter
+            return self.seen_filters[(source, label)]
+
+    def remember(self, source: str, records: list):
+        with self.lock:
+            if self.transaction_depth > 0:
+                self.pending_seen.append((source, records))
+                return
+            for (src, label), seen_filter in self.seen_filters.items():
+                if src == source:
+                    idx = RECORD_FIELDS[label]
+                    for record in records:
+                        seen_filter.add(record[idx])
+
+    def forget(self, rows: list):
+        """rows 為被刪除公告的 (source, md5, 標題, 連結), 不能再被 recent 當成已存在"""
+        with self.lock:
+            for (src, label), seen_filter in self.seen_filters.items():
+                idx = RECORD_FIELDS[label]
+                for row in rows:
+                    if row[0] == src:
+                        seen_filter.discard(row[1 + idx])
+
+    def filter_new(self, source: str, values: list, label: str = "md5"):
+        """一次查出 values 中尚未存在於來源的值 (label 為 md5 或 link), 以 IN 分段查詢避免超過參數上限"""
+        new_values = set()
+        uncertain = []
+        if self.use_seen_filters:
+            seen_filter = self.get_seen_filter(source, label)
+            with self.lock:
+                for value in values:
+                    if not seen_filter.might_contain(value):
+                        new_values.add(value)
+                    elif not seen_filter.is_recent(value):
+                        uncertain.append(value)
+        else:
+            uncertain = list(values)
+        if not uncertain:
+            return new_values
+        # Bloom filter 無法確定的值才查 SQLite, (source, md5) 與 (source, link) 都有索引
+        new_values.update(uncertain)
+        chunk_size = 500
+        with self.cursor() as cur:
+            for i in range(0, len(uncertain), chunk_size):
+                chunk = uncertain[i : i + chunk_size]
+                cur.execute(
+                    f"SELECT {label} FROM posts WHERE source = ? AND {label} IN ({','.join(['?' for _ in chunk])})",
+                    [source, *chunk],
+                )
+                new_values.difference_update(r[0] for r in cur.fetchall())
+        return new_values
+
+    def insert_posts(self, source: str, records: list):
+        """records 為 PostSchema.record 的 (md5, 標題, 連結, 發布日期, 內文, 其餘欄位)"""
+        if not records:
+            return
+        now = int(time.time())
+        with self.transaction() as con:
+            con.executemany(
+                "INSERT INTO posts (source, md5, title, link, published, published_on, body, extra, created_at) VALUES(?,?,?,?,?,?,?,?,?)",
+                [
+                    (
+                        source,
+                        md5,
+                        title,
+                        link,
+                        published,
+                        normalize_date(published or ""),
+                        deflate_body(body, self.body_compress_threshold),
+                        extra,
+                        now,
+                    )
+                    for md5, title, link, published, body, extra in records
+                ],
+            )
+            if self.fts:
+                con.executemany(
+                    "INSERT INTO post_search (rowid, title, body) SELECT rowid, ?, ? FROM posts WHERE source = ? AND md5 = ?",
+                    [
+                        (title, body, source, md5)
+                        for md5, title, _, _, body, _ in records
+                    ],
+                )
+            self.remember(source, records)
+
+    def replace_posts(self, source: str, records: list):
+        """以連結找到舊的公告並換成新的 (公告被編輯時)"""
+        if not records:
+            return
+        with self.transaction() as con:
+            self.delete_posts(
+                con,
+                "source = ? AND link = ?",
+                [(source, record[RECORD_FIELDS["link"]]) for record in records],
+            )
+            self.insert_posts(source, records)
+
+    def delete_posts(self, con, where: str, params: list):
+        """刪除符合 where 的公告; contentless 的全文檢索要帶原本的內容才能刪除"""
+        if self.seen_filters:
+            deleted = []
+            for param in params:
+                deleted += con.execute(
+                    f"SELECT source, md5, title, link FROM posts WHERE {where}", param
+                ).fetchall()
+            self.forget(deleted)
+        if self.fts:
+            con.executemany(
+                f"INSERT INTO post_search (post_search, rowid, title, body) SELECT 'delete', rowid, title, inflate(body) FROM posts WHERE {where}",
+                params,
+            )
+        con.executemany(f"DELETE FROM posts WHERE {where}", params)
+
+    def prune(self, retention_days: int) -> int:
+        """刪除發布日期 (沒有日期時為寫入時間) 早於 retention_days 天前的公告"""
+        since = local_now().date() - datetime.timedelta(days=retention_days)
+        params = (since.isoformat(), int(time.time()) - retention_days * 86400)
+        where = "published_on < ? OR (published_on IS NULL AND created_at < ?)"
+        with self.transaction() as con:
+            (count,) = con.execute(
+                f"SELECT count(*) FROM posts WHERE {where}", params
+            ).fetchone()
+            if count:
+                self.delete_posts(con, where, [params])
+        return count
+
+    def maintain(self, retention_days: int = 0):
+        """定期維護: 刪除超過保留期限的公告, 合併全文檢索的片段, 歸還空頁並更新統計
+
+        合併片段與取樣統計每次只處理固定的量, 不會隨資料庫變大而變慢.
+        """
+        if retention_days > 0:
+            pruned = self.prune(retention_days)
+            if pruned:
+                logger.info(f"刪除 {pruned} 則超過 {retention_days} 天的公告")
+        with self.cursor(op="maintenance") as cur:
+            if self.fts:
+                cur.execute(
+                    "INSERT INTO post_search (post_search, rank) VALUES ('merge', 2000)"
+                )
+            # execute 只會執行一步 (歸還一頁), executescript 才會執行到完
+            cur.executescript("PRAGMA incremental_vacuum;")
+            # 每個索引只取樣固定筆數
+            cur.execute("PRAGMA analysis_limit=1000")
+            cur.execute("ANALYZE")
+
 
 ### message workers ###
-class LineWorker:
+class PartialDelivery(Exception):
+    """send_batch 已送出前 delivered 則訊息後失敗, 原本的例外在 __cause__"""
+
+    def __init__(self, delivered: int) -> None:
+        super().__init__(f"送出 {delivered} 則訊息後失敗")
+        self.delivered = delivered
+
+
+class MessageWorker(ABC):
+    """訊息先排進佇列, 由背景 thread 批次送出, 爬蟲不會被聊天平台的 API 拖慢
+
+    送出失敗的批次會留在記憶體中, 以指數退避重試 notify_max_retries 次,
+    仍然失敗才放棄並通知管理員. 一個批次會分成數次 API 呼叫, 只重送還沒送出的訊息.
+    """
+
+    def __init__(self) -> None:
+        self.batch_wait: float = CONFIG.get("notify_batch_wait", 1.0)
+        self.max_batch_size: int = CONFIG.get("notify_max_batch_size", 50)
+        self.retry_base: float = CONFIG.get("notify_retry_base", 30)
+        self.max_retries: int = CONFIG.get("notify_max_retries", 5)
+        self.queue: queue.Queue = queue.Queue()
+        # 等待重試的批次: (下次重試的 monotonic 時間, 已重試次數, to, messages)
+        self.retries: list[tuple[float, int, str, list]] = []
+        self.retry_lock = threading.Lock()
+        self.sender = threading.Thread(target=self.run_sender, daemon=True)
+        self.sender.start()
+        # 結束前把佇列中的訊息送完
+        atexit.register(self.flush)
+
+    def submit(self, to: str, message):
+        self.queue.put((to, message))
+
+    def flush(self):
+        self.queue.join()
+        # 還在等待重試的批次最後再送一次, 失敗的通知管理員
+        with self.retry_lock:
+            retries, self.retries = self.retries, []
+        for _, _, to, messages in retries:
+            self.deliver(to, messages, self.max_retries)
+        self.queue.join()
+
+    def next_retry_delay(self) -> Optional[float]:
+        with self.retry_lock:
+            if not self.retries:
+                return None
+            return max(0.0, min(retry[0] for retry in self.retries) - time.monotonic())
+
+    def run_sender(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.next_retry_delay())]
+            except queue.Empty:
+                batch = []
+            # 等一小段時間, 把同一輪排進來的訊息一起送
+            while batch and len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=self.batch_wait))
+                except queue.Empty:
+                    break
+            messages: dict[str, list] = {}
+            for to, message in batch:
+                messages.setdefault(to, []).append(message)
+            for to, to_messages in messages.items():
+                self.deliver(to, to_messages)
+            self.run_retries()
+            for _ in batch:
+                self.queue.task_done()
+
+    def run_retries(self):
+        now = time.monotonic()
+        with self.retry_lock:
+            due = [retry for retry in self.retries if retry[0] <= now]
+            self.retries = [retry for retry in self.retries if retry[0] > now]
+        for _, attempt, to, messages in due:
+            self.deliver(to, messages, attempt)
+
+    def deliver(self, to: str, messages: list, attempt: int = 0):
+        """送出一個批次, 失敗時排入重試; 超過重試次數才放棄並通知管理員"""
+        platform_name = type(self).__name__
+        try:
+            with METRICS.timer("bcfinder_notify_seconds", platform=platform_name):
+                self.send_batch(to, messages)
+            METRICS.inc(
+                "bcfinder_notify_messages_total",
+                len(messages),
+                platform=platform_name,
+            )
+            return
+        except Exception as e:
+            METRICS.inc("bcfinder_notify_errors_total", platform=platform_name)
+            logger.exception(e)
+            error = e
+        if isinstance(error, PartialDelivery):
+            # 已經送出的部分不再重送
+            METRICS.inc(
+                "bcfinder_notify_messages_total",
+                error.delivered,
+                platform=platform_name,
+            )
+            messages = messages[error.delivered :]
+            error = error.__cause__
+        if attempt < self.max_retries:
+            delay = self.retry_base * 2**attempt
+            logger.warning(
+                f"{len(messages)} 則訊息送往 {to} 失敗, {delay:.0f} 秒後第 {attempt + 1} 次重試"
+            )
+            with self.retry_lock:
+                self.retries.append(
+                    (time.monotonic() + delay, attempt + 1, to, messages)
+                )
+            return
+        METRICS.inc(
+            "bcfinder_notify_dropped_total", len(messages), platform=platform_name
+        )
+        logger.error(f"{len(messages)} 則訊息送往 {to} 失敗 {attempt + 1} 次, 放棄重送")
+        # 送給管理員的訊息失敗時只留 log, 以免不斷重送
+        if to != "admin":
+            self.notify_admin(
+                f"通知送出失敗: {len(messages)} 則訊息無法送往 {to}, 已重試 {attempt} 次\n{error!r}"
+            )
+
+    @abstractmethod
+    def notify_admin(self, text: str):
+        """送出給管理員的文字訊息"""
+
+    @abstractmethod
+    def send_batch(self, to: str, messages: list):
+        """送出同一個目的地的訊息, 部分送出後失敗時 raise PartialDelivery"""
+
+
+class RenderedFlexMessage:
+    """contents 是渲染好的 dict, 直接送出, 不再轉成 SDK 的物件樹
+
+    push_message 只會呼叫 as_json_dict, 不必繼承 SDK 的 FlexSendMessage.
+    """
+
+    def __init__(self, alt_text: str, contents: dict) -> None:
+        self.alt_text = alt_text
+        self.contents = contents
+
+    def as_json_dict(self):
+        return {"type": "flex", "altText": self.alt_text, "contents": self.contents}
+
+
+FlexBubble = collections.namedtuple("FlexBubble", ["alt_text", "contents"])
+
+
+class LineWorker(MessageWorker):
+    # line_flex_message_template.json 中要填值的位置
+    flex_slots: dict = {
+        "message_title": ("body", "contents", 0, "text"),
+        "title_color": ("body", "contents", 0, "color"),
+        "title": ("body", "contents", 1, "contents", 1, "text"),
+        "link": ("body", "contents", 2, "contents", 1, "action", "uri"),
+        "published": ("body", "contents", 3, "contents", 1, "text"),
+    }
+
     def __init__(self) -> None:
+        from linebot import LineBotApi, WebhookHandler
+
+        super().__init__()
         self.admin_id = CONFIG.get("line_admin_id")
         self.group_chat_id = CONFIG.get("line_group_chat_id")
         self.channel_access_token = CONFIG.get("line_channel_access_token")
+        self.api_client = LineBotApi(
+            self.channel_access_token,
+            endpoint=CONFIG.get("line_api_endpoint", "https://api.line.me"),
+        )
         self.handler_client = WebhookHandler(CONFIG.get("line_channel_secret"))
         with open("line_flex_message_template.json", "r", encoding="utf-8") as f:
-            self.flex_message_template = json.load(f)
+            self.flex_template = FlexTemplate(json.load(f), self.flex_slots)
+        self.carousel_size: int = min(
+            CONFIG.get("line_carousel_size", MAX_CAROUSEL_SIZE), MAX_CAROUSEL_SIZE
+        )
 
     def get_id(self, to: str):
         if to == "admin":
             return self.admin_id
         elif to == "group_chat":
             return self.group_chat_id
+        # 訂閱者直接指定的群組 / 使用者 id
+        return to
 
     def format_flex_message(
         self,
@@ -134,32 +1097,94 @@ class LineWorker:
         link: str,
         published: str,
     ):
-        template = self.flex_message_template
-        template["body"]["contents"][0]["text"] = message_title
-        template["body"]["contents"][0]["color"] = title_color
-        template["body"]["contents"][1]["contents"][1]["text"] = title
-        template["body"]["contents"][2]["contents"][1]["action"]["uri"] = link
-        template["body"]["contents"][3]["contents"][1]["text"] = published
-        return template
+        # 每次都渲染出新的 dict, 佇列中的訊息不會共用同一份範本
+        return self.flex_template.render(
+            message_title=message_title,
+            title_color=title_color,
+            title=title,
+            link=link,
+            published=published,
+        )
 
     def send_text_message(self, to: str, text: str):
-        id_ = self.get_id(to=to)
-        api_client = LineBotApi(self.channel_access_token)
-        api_client.push_message(id_, TextSendMessage(text))
+        from linebot.models import TextSendMessage
+
+        self.submit(to, TextSendMessage(text))
+
+    def notify_admin(self, text: str):
+        self.send_text_message(to="admin", text=text)
 
     def send_flex_message(self, to: str, alt_text: str, flex_message):
+        if isinstance(flex_message, dict) and flex_message.get("type") == "bubble":
+            # 單一 bubble 先留著, 送出前再和同一批的其他 bubble 合併成 carousel
+            self.submit(to, FlexBubble(alt_text, flex_message))
+        else:
+            from linebot.models import FlexSendMessage
+
+            self.submit(to, FlexSendMessage(alt_text=alt_text, contents=flex_message))
+
+    def pack_messages(self, messages: list):
+        """連續的 bubble 合併成最多 carousel_size 個一組的 carousel
+
+        回傳 (要送出的訊息, 包含幾則原本的訊息).
+        """
+        packed = []
+        bubbles = []
+
+        def flush_bubbles():
+            for i in range(0, len(bubbles), max(self.carousel_size, 1)):
+                chunk = bubbles[i : i + max(self.carousel_size, 1)]
+                if len(chunk) == 1:
+                    packed.append((RenderedFlexMessage(*chunk[0]), 1))
+                else:
+                    packed.append(
+                        (
+                            RenderedFlexMessage(
+                                f"{chunk[0].alt_text} 等 {len(chunk)} 則",
+                                carousel([bubble.contents for bubble in chunk]),
+                            ),
+                            len(chunk),
+                        )
+                    )
+            bubbles.clear()
+
+        for message in messages:
+            if isinstance(message, FlexBubble):
+                bubbles.append(message)
+            else:
+                flush_bubbles()
+                packed.append((message, 1))
+        flush_bubbles()
+        return packed
+
+    def send_batch(self, to: str, messages: list):
         id_ = self.get_id(to=to)
-        api_client = LineBotApi(self.channel_access_token)
-        api_client.push_message(
-            id_, FlexSendMessage(alt_text=alt_text, contents=flex_message)
-        )
+        packed = self.pack_messages(messages)
+        delivered = 0
+        # push_message 一次最多 5 則訊息
+        for i in range(0, len(packed), 5):
+            chunk = packed[i : i + 5]
+            try:
+                self.api_client.push_message(id_, [message for message, _ in chunk])
+            except Exception as e:
+                raise PartialDelivery(delivered) from e
+            delivered += sum(count for _, count in chunk)
 
 
-class DiscordWorker:
+class DiscordWorker(MessageWorker):
     def __init__(self) -> None:
+        super().__init__()
         self.token: str = CONFIG.get("discord_token")
         self.admin_channel_id: int = 1126352290492723322
         self.channel_id: int = 1125437819607863307
+        self.api_base: str = CONFIG.get(
+            "discord_api_base", "https://discord.com/api/v10"
+        )
+        import requests
+
+        # 走 REST API, 不用每次都登入 gateway
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bot {self.token}"})
 
     def format_message(
         self,
@@ -170,355 +1195,955 @@ class DiscordWorker:
     ):
         return f"**{title}**\n標題: {message_title}\n連結: {link}\n日期: {published}"
 
-    async def send_message(self, to: str, text: str = ""):
-        client = discord.Client(intents=discord.Intents.default())
+    def get_channel_id(self, to: str):
         if to == "admin":
-            channel_id = self.admin_channel_id
+            return self.admin_channel_id
         elif to == "normal":
-            channel_id = self.channel_id
+            return self.channel_id
+        # 訂閱者直接指定的頻道 id
+        return to
+
+    def send_message(self, to: str, text: str = ""):
+        self.submit(to, text)
+
+    def notify_admin(self, text: str):
+        self.send_message(to="admin", text=text)
+
+    def pack_messages(self, texts: list):
+        # Discord 單則訊息上限 2000 字, 盡量把多則通知合併成一則
+        # 回傳 [合併後的內容, 包含幾則原本的訊息]
+        packed = []
+        for text in texts:
+            if packed and len(packed[-1][0]) + len(text) + 2 <= 2000:
+                packed[-1][0] += "\n\n" + text
+                packed[-1][1] += 1
+            else:
+                packed.append([text[:2000], 1])
+        return packed
+
+    def send_batch(self, to: str, messages: list):
+        channel_id = self.get_channel_id(to)
+        delivered = 0
+        for content, count in self.pack_messages(messages):
+            try:
+                self.post_message(channel_id, content)
+            except Exception as e:
+                raise PartialDelivery(delivered) from e
+            delivered += count
+
+    def post_message(self, channel_id, content: str):
+        while True:
+            r = self.session.post(
+                f"{self.api_base}/channels/{channel_id}/messages",
+                json={"content": content},
+                timeout=10,
+            )
+            if r.status_code == 429:
+                time.sleep(float(r.json().get("retry_after", 1)))
+                continue
+            r.raise_for_status()
+            logger.info("Message sent successfully.")
+            break
+
+
+### subscribers ###
+class SubscriberRouter:
+    """依 config.json 的 subscribers 決定一則公告要通知哪些群組 / 頻道
+
+    所有訂閱者的關鍵字合併成一個 KeywordMatcher, 每則公告只比對一次.
+    沒有設定 keywords 的訂閱者會收到來源的所有公告; 沒有設定 subscribers 時
+    等同只有一個通知預設群組的訂閱者 (to 為 None).
+    """
+
+    def __init__(self, source_name: str) -> None:
+        subscribers = [
+            subscriber
+            for subscriber in CONFIG.get("subscribers") or [{"name": "default"}]
+            if not subscriber.get("sources") or source_name in subscriber["sources"]
+        ]
+        self.targets: list = [subscriber.get("to") for subscriber in subscribers]
+        self.catch_all: list[int] = [
+            i
+            for i, subscriber in enumerate(subscribers)
+            if not subscriber.get("keywords")
+        ]
+        keywords: dict[str, set] = {}
+        for i, subscriber in enumerate(subscribers):
+            for keyword in subscriber.get("keywords", []):
+                keywords.setdefault(keyword, set()).add(i)
+        self.matcher = KeywordMatcher(keywords)
 
-        @client.event
-        async def on_ready():
-            nonlocal channel_id
-            nonlocal text
+    def matches(self, title: str) -> bool:
+        """是否有訂閱者的關鍵字出現在標題中"""
+        return bool(self.matcher.match(title))
 
-            channel = client.get_channel(channel_id)
+    def route(self, title: str, relevant: bool = True) -> list:
+        """回傳要通知的對象, relevant 為 False 時只通知關鍵字符合的訂閱者"""
+        matched = self.matcher.match(title)
+        if relevant:
+            matched.update(self.catch_all)
+        return list(dict.fromkeys(self.targets[i] for i in sorted(matched)))
 
-            if channel:
-                # Send the message to the channel
-                await channel.send(text)
-                logger.info("Message sent successfully.")
-            else:
-                logger.error("Invalid channel ID.")
 
-            # Close the client connection
-            await client.close()
+### base worker ###
+SNAPSHOT_BLOCK = re.compile(r"(?<=</tr>)|(?<=</item>)|(?<=</entry>)|\n")
 
-        # Run the client asynchronously
-        await client.start(self.token)
 
+class Worker(ABC):
+    # 所有 worker 共用連線池, 第一個 worker 建立時才 import requests
+    session: Optional[requests.Session] = None
 
-### base worker ###
-class Worker:
-    def __init__(self) -> None:
+    # 送出通知時使用的欄位名稱
+    title_label: str = "title"
+    link_label: str = "link"
+    published_label: str = "published"
+    # 存進 posts.body 的內文欄位, 會被壓縮並建立全文檢索
+    body_label: str = "description"
+
+    def __init__(
+        self,
+        db: DB,
+        message_worker: Union[LineWorker, DiscordWorker],
+        source: dict,
+    ) -> None:
+        if Worker.session is None:
+            import requests
+
+            Worker.session = requests.Session()
+        self.source: dict = source
+        self.name: str = source["name"]
+        self.db: DB = db
+        self.message_worker: Union[LineWorker, DiscordWorker] = message_worker
+        self.table_name: str = source["table"]
+        self.title_color: str = source.get("title_color", "#000000")
+        self.url: str = source["url"]
+        self.message_title: str = source.get("message_title", f"羽球場-{self.name}")
+        self.filter_pattern: str = source.get(
+            "filter_pattern", CONFIG.get("filter_pattern", r"羽球|場地|租借")
+        )
         self.reurl_post_uri = CONFIG.get("reurl_post_uri")
         self.reurl_api_key = CONFIG.get("reurl_api_key")
+        self.reurl_timeout: float = CONFIG.get("reurl_timeout", 5)
+        # 每個 HTTP 請求的逾時, 學校網站沒有回應時不會卡住整個 process
+        self.request_timeout: float = CONFIG.get("request_timeout", 30)
+        self.reurl_max_workers: int = CONFIG.get("reurl_max_workers", 4)
+        self.short_url_ttl: int = CONFIG.get("short_url_ttl", 30 * 86400)
+        self.short_url_cache_size: int = CONFIG.get("short_url_cache_size", 5000)
+        # 等處理成功後才寫入 http_cache 的驗證資訊
+        self.pending_validators: dict = {}
+        self.snapshot_retention: int = source.get(
+            "snapshot_retention", CONFIG.get("snapshot_retention", 10)
+        )
+        self.notify_updates: bool = CONFIG.get("notify_updates", True)
+        self.retention_days: int = CONFIG.get("retention_days", 0)
+        self.router = SubscriberRouter(self.name)
+
+    def stage(self, stage: str):
+        return METRICS.timer("bcfinder_stage_seconds", source=self.name, stage=stage)
+
+    def record_response(self, status: int, content: bytes):
+        METRICS.inc("bcfinder_http_responses_total", source=self.name, status=status)
+        METRICS.inc("bcfinder_http_bytes_total", len(content), source=self.name)
 
     def get_content(self, url: str):
-        r = requests.get(url)
+        with self.stage("detail"):
+            r = self.session.get(url, timeout=self.request_timeout)
+        self.record_response(r.status_code, r.content)
         return r.content.decode("utf-8")
 
-    def get_shorten_url(self, url: str):
-        try:
-            r = requests.post(
-                url=self.reurl_post_uri,
-                headers={
-                    "Content-Type": "application/json",
-                    "reurl-api-key": self.reurl_api_key,
-                },
-                data='{"url":"' + url + '"}',
+    def get_conditional_headers(self, validators):
+        headers = {}
+        if validators:
+            etag, last_modified, _ = validators
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def check_modified(
+        self, url: str, validators, status: int, headers, content: bytes
+    ):
+        """回傳 False 代表內容沒有變動 (304 或內容 md5 相同)"""
+        if status == 304:
+            return False
+        body_md5 = hashlib.md5(content).hexdigest()
+        if validators and validators[2] == body_md5:
+            return False
+        self.pending_validators[url] = (
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+            body_md5,
+        )
+        return True
+
+    def get_content_if_modified(self, url: str) -> Optional[bytes]:
+        validators = self.db.get_validators(url)
+        with self.stage("fetch"):
+            r = self.session.get(
+                url,
+                headers=self.get_conditional_headers(validators),
+                timeout=self.request_timeout,
             )
+        self.record_response(r.status_code, r.content)
+        if r.status_code != 304:
+            r.raise_for_status()
+        if not self.check_modified(
+            url, validators, r.status_code, r.headers, r.content
+        ):
+            return None
+        return r.content
+
+    async def get_content_if_modified_async(
+        self, session: aiohttp.ClientSession, url: str
+    ) -> Optional[bytes]:
+        validators = self.db.get_validators(url)
+        with self.stage("fetch"):
+            async with session.get(
+                url, headers=self.get_conditional_headers(validators)
+            ) as r:
+                content = await r.read()
+        self.record_response(r.status, content)
+        if r.status != 304:
+            r.raise_for_status()
+        if not self.check_modified(url, validators, r.status, r.headers, content):
+            return None
+        return content
+
+    def get_shorten_urls(self, urls: list) -> dict:
+        """批次取得短網址, 先查快取, 沒有的才平行呼叫 reurl, 失敗時用原本的連結"""
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        short_urls = self.db.get_short_urls(urls, ttl=self.short_url_ttl)
+        missing = [url for url in urls if url not in short_urls]
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.reurl_max_workers) as executor:
+                results = dict(
+                    zip(missing, executor.map(self.request_shorten_url, missing))
+                )
+            fetched = {
+                url: short_url for url, short_url in results.items() if short_url
+            }
+            if fetched:
+                self.db.set_short_urls(
+                    fetched, ttl=self.short_url_ttl, max_size=self.short_url_cache_size
+                )
+            short_urls.update(fetched)
+        return {url: short_urls.get(url, url) for url in urls}
+
+    def request_shorten_url(self, url: str) -> Optional[str]:
+        try:
+            with self.stage("reurl"):
+                r = self.session.post(
+                    url=self.reurl_post_uri,
+                    headers={
+                        "Content-Type": "application/json",
+                        "reurl-api-key": self.reurl_api_key,
+                    },
+                    data=json.dumps({"url": url}),
+                    timeout=self.reurl_timeout,
+                )
+            self.record_response(r.status_code, r.content)
             return r.json()["short_url"]
         except Exception as e:
             logger.error(e)
+            return None
+
+    def diff_snapshot(self, content: bytes) -> str:
+        """回傳與上一份快照相比新增或修改的內容, 只讀取資料庫"""
+        previous = self.db.latest_snapshot(self.name)
+        if previous is None:
             return ""
+        # 以表格列 / feed 項目為單位比較, 同一則公告的標題與連結會落在同一塊.
+        # 只需要新增或修改過的區塊, 與上一份的區塊集合相減即可, 成本與頁面大小成正比
+        previous_blocks = set(SNAPSHOT_BLOCK.split(previous.decode("utf-8", "replace")))
+        changed = [
+            block
+            for block in SNAPSHOT_BLOCK.split(content.decode("utf-8", "replace"))
+            if block not in previous_blocks
+        ]
+        logger.info(f"{self.name} 與上次快照相比有 {len(changed)} 個區塊變動")
+        return "\n".join(changed)
 
-    def hash_row_data(self, row):
-        md5 = hashlib.md5()
-        for data in row:
-            md5.update(data.encode("utf-8"))
-        return md5.hexdigest()
+    def link_variants(self, link: str):
+        return [link, html.escape(link)]
 
+    def is_touched(self, link: str, changed_text: str):
+        """連結是否出現在快照變動的區段中 (可能是被編輯過的舊公告)"""
+        if not changed_text:
+            return False
+        return any(variant in changed_text for variant in self.link_variants(link))
 
-### workers ###
-class ZSJHSWorker(Worker):
-    def __init__(
-        self, db: DB, message_worker: Union[LineWorker, DiscordWorker]
-    ) -> None:
-        super().__init__()
-        self.name: str = "中山國中"
-        self.db: DB = db
-        self.message_worker: Union[LineWorker, DiscordWorker] = message_worker
-        self.table_name: str = "zsjhs"
-        self.title_color: str = "#f5a142"
-        self.base_url: str = "http://www.csjhs.tp.edu.tw/news/"
-        self.zsjhs_url: str = "u_news_v1.asp?id={F246F2F4-4F1E-42DA-B518-5FB731FD672F}"
-        self.message_title = f"羽球場-{self.name}"
+    @abstractmethod
+    def parse(self, content: bytes):
+        """把抓到的頁面 / feed 解析成 extract 使用的內容"""
+
+    @abstractmethod
+    def extract(self, payload, changed_text: str = "") -> list[Post]:
+        """從解析後的內容取出候選的公告"""
+
+    def extract_state(self, payload):
+        """送出通知後要寫回資料庫的來源狀態"""
+        return None
 
-    def send_message(self, col, row):
+    def save_state(self, state):
+        pass
+
+    def collect(self, content: bytes) -> dict:
+        """比對快照、解析並取出公告
+
+        只讀取資料庫, 可以在子 process 中執行, 結果交給 commit 寫入.
+        """
+        with self.stage("diff"):
+            changed_text = self.diff_snapshot(content)
+        with self.stage("parse"):
+            payload = self.parse(content)
+        with self.stage("extract"):
+            posts = self.extract(payload, changed_text)
+        METRICS.inc("bcfinder_rows_total", len(posts), source=self.name, kind="seen")
+        return {
+            "content": content,
+            "posts": posts,
+            "state": self.extract_state(payload),
+            "validators": self.pending_validators.pop(self.url, None),
+        }
+
+    def commit(self, collected: dict):
+        """送出通知並寫入資料庫, 只在主 process 執行"""
+        return self.publish(collected["posts"], collected)
+
+    def save_progress(self, collected: dict):
+        """寫入來源狀態與驗證資訊, 最後才保存快照
+
+        由 publish 在寫入公告的同一個 transaction 中呼叫; 任何一步失敗時快照也不會存下,
+        下一輪仍會與上一份處理完的快照比較, 不會漏掉被編輯過的舊公告.
+        """
+        self.save_state(collected["state"])
+        if collected["validators"]:
+            self.db.set_validators(self.url, *collected["validators"])
+        with self.stage("snapshot"):
+            self.db.save_snapshot(
+                self.name, collected["content"], retention=self.snapshot_retention
+            )
+
+    def handle_content(self, content: bytes):
+        return self.commit(self.collect(content))
+
+    def main(self):
+        try:
+            content = self.get_content_if_modified(self.url)
+            if content is None:
+                logger.info(f"{self.name}內容沒有更新。")
+                return 0
+            return self.handle_content(content)
+        except Exception as e:
+            logger.exception(e)
+            raise
+
+    async def main_async(self, session: aiohttp.ClientSession):
+        import asyncio
+
+        try:
+            content = await self.get_content_if_modified_async(session, self.url)
+            if content is None:
+                logger.info(f"{self.name}內容沒有更新。")
+                return 0
+            # 解析與後續處理仍為同步, 丟到 thread 以免卡住其他來源.
+            # thread 無法取消, 因此不套用 source_timeout, 等它真的結束才回報結果;
+            # 其中的每個請求都有 request_timeout
+            return await asyncio.to_thread(self.handle_content, content)
+        except Exception as e:
+            logger.exception(e)
+            raise
+
+    def publish(self, posts: list[Post], collected: Optional[dict] = None):
+        """送出新公告與被編輯過的公告, 並寫入資料庫, 回傳送出的數量
+
+        collected 為 collect 的結果, 全部送出後與公告一起以 save_progress 寫入.
+        """
+        seen = len(posts)
+        with self.stage("dedupe"):
+            if self.retention_days > 0:
+                # 超過保留期限的公告會被 maintain 刪除, 不能當成新公告再通知一次
+                since = (
+                    local_now().date() - datetime.timedelta(days=self.retention_days)
+                ).isoformat()
+                posts = [
+                    post
+                    for post in posts
+                    if (normalize_date(post.published) or since) >= since
+                ]
+            new_md5s = self.db.filter_new(self.table_name, [post.md5 for post in posts])
+            posts = [post for post in posts if post.md5 in new_md5s]
+            # md5 沒看過但連結已存在, 代表公告被編輯過
+            new_links = self.db.filter_new(
+                self.table_name, [post.link for post in posts], label="link"
+            )
+        # 先一次把要送出的連結都縮好
+        with self.stage("shorten"):
+            short_urls = self.get_shorten_urls([post.link for post in posts])
+        sent = []
+        updated = []
+        send_started = time.perf_counter()
+        completed = False
+        try:
+            for post in posts:
+                if post.md5 not in new_md5s:
+                    continue
+                new_md5s.discard(post.md5)
+                if post.link in new_links:
+                    self.send_message(post, short_urls[post.link])
+                    sent.append(post)
+                else:
+                    if self.notify_updates:
+                        self.send_message(post, short_urls[post.link], update=True)
+                    updated.append(post)
+                logger.info(f"發送訊息: 標題: {post.title}, 發布日期: {post.published}")
+            completed = True
+        finally:
+            METRICS.observe(
+                "bcfinder_stage_seconds",
+                time.perf_counter() - send_started,
+                source=self.name,
+                stage="send",
+            )
+            # 已送出的通知一次寫入, 整個 cycle 只 commit 一次
+            with self.stage("store"), self.db.transaction():
+                self.insert_to_db(sent)
+                self.db.replace_posts(
+                    self.table_name, [self.schema.record(post) for post in updated]
+                )
+                if completed and collected is not None:
+                    self.save_progress(collected)
+        METRICS.inc("bcfinder_rows_total", len(sent), source=self.name, kind="new")
+        METRICS.inc(
+            "bcfinder_rows_total", len(updated), source=self.name, kind="updated"
+        )
+        METRICS.inc(
+            "bcfinder_rows_total",
+            seen - len(sent) - len(updated),
+            source=self.name,
+            kind="skipped",
+        )
+        count = len(sent) + len(updated)
+        if count == 0:
+            logger.info(f"沒有找到{self.name}相關的通知。")
+        return count
+
+    def matches_filter(self, title: str) -> bool:
+        """公告是否符合來源本身的過濾條件, 沒有設定關鍵字的訂閱者只會收到這些公告"""
+        return True
+
+    def send_message(self, post: Post, link: str, update: bool = False):
+        targets = self.router.route(post.title, self.matches_filter(post.title))
+        if not targets:
+            logger.debug(f"沒有訂閱者需要這則公告: {post.title}")
+            return
+        message_title = f"{self.message_title}(更新)" if update else self.message_title
         if isinstance(self.message_worker, LineWorker):
-            self.message_worker.send_flex_message(
-                to="group_chat",
-                alt_text=f"羽球場地通知-{self.name}",
-                flex_message=self.message_worker.format_flex_message(
-                    message_title=self.message_title,
-                    title_color=self.title_color,
-                    title=row[col.index("標題")],
-                    link=self.get_shorten_url(row[col.index("標題連結")]),
-                    published=row[col.index("發布日期")],
-                ),
+            flex_message = self.message_worker.format_flex_message(
+                message_title=message_title,
+                title_color=self.title_color,
+                title=post.title,
+                link=link,
+                published=post.published,
             )
-        elif isinstance(self.message_worker, DiscordWorker):
-            asyncio.run(
-                self.message_worker.send_message(
-                    to="normal",
-                    text=self.message_worker.format_message(
-                        title=self.message_title,
-                        message_title=row[col.index("標題")],
-                        link=self.get_shorten_url(row[col.index("標題連結")]),
-                        published=row[col.index("發布日期")],
-                    ),
+            # 同一則公告的 bubble 只渲染一次, 各訂閱者共用
+            for to in targets:
+                self.message_worker.send_flex_message(
+                    to=to or "group_chat",
+                    alt_text=f"羽球場地通知-{self.name}",
+                    flex_message=flex_message,
                 )
+        elif isinstance(self.message_worker, DiscordWorker):
+            text = self.message_worker.format_message(
+                title=message_title,
+                message_title=post.title,
+                link=link,
+                published=post.published,
             )
+            for to in targets:
+                self.message_worker.send_message(to=to or "normal", text=text)
+
+    def insert_to_db(self, posts: list[Post]):
+        return self.db.insert_posts(
+            self.table_name, [self.schema.record(post) for post in posts]
+        )
+
+
+### workers ###
+class HTMLTableWorker(Worker):
+    """列表頁為 HTML 表格, 每列公告另有詳細內容頁的來源"""
+
+    title_label: str = "標題"
+    link_label: str = "標題連結"
+    published_label: str = "發布日期"
+    body_label: str = "詳細內容"
+
+    def __init__(
+        self,
+        db: DB,
+        message_worker: Union[LineWorker, DiscordWorker],
+        source: dict,
+    ) -> None:
+        super().__init__(db, message_worker, source)
+        self.base_url: str = urljoin(self.url, ".")
+        self.table_pattern: str = source.get("table_pattern", "場地租借")
+        self.row_class_pattern: str = source.get(
+            "row_class_pattern", "C-tableA2|C-tableA3"
+        )
+        self.exclude_columns: list = source.get("exclude_columns", ["點閱次數"])
+        self.detail_table_pattern: str = source.get("detail_table_pattern", r"\*")
+        self.detail_exclude_columns: list = source.get(
+            "detail_exclude_columns", ["點閱次數", "標題", "發布日期", "發布單位"]
+        )
+        self.table_columns: list = source.get(
+            "columns",
+            ["序號", "標題", "標題連結", "發布單位", "發布日期", "詳細內容", "相關連結", "相關檔案"],
+        )
+        self.identity_keys: list = source.get("identity_keys", ["標題連結", "發布日期"])
+        self.schema = PostSchema(
+            self.table_columns,
+            self.title_label,
+            self.link_label,
+            self.published_label,
+            self.identity_keys,
+            self.body_label,
+        )
+        self.db.migrate_table(self.table_name, self.schema)
+        self.db.migrate_identity(self.table_name, self.identity_keys, self.schema)
+        self.max_detail_workers: int = CONFIG.get("max_detail_workers", 8)
+        self.early_stop: bool = source.get("early_stop", CONFIG.get("early_stop", True))
+        self.early_stop_after: int = source.get(
+            "early_stop_after", CONFIG.get("early_stop_after", 3)
+        )
 
     def extract_columns(self, soup: BeautifulSoup, q: str, to_exclude: list):
         table = soup.find("table", {"summary": re.compile(q)})
-        columns = [
-            re.sub(r"\s+", "", th.text) for th in table.find("tr").find_all("th")
-        ]
+        columns = [strip_whitespace(th.text) for th in table.find("tr").find_all("th")]
         columns = list(filter(lambda x: x not in to_exclude, columns))
         return columns
 
-    def extract_posts(self, page_content: str):
-        soup = BeautifulSoup(page_content, "html.parser")
-        columns = self.extract_columns(soup, "場地租借", ["點閱次數"])
-        trs = soup.find_all("tr", {"class": re.compile("C-tableA2|C-tableA3")})
+    def is_known_post(self, url: str):
+        return not self.db.filter_new(self.table_name, [url], label="link")
+
+    def extract_posts(
+        self, page_content: str, stop_at_known: bool = False, changed_text: str = ""
+    ):
+        from bs4 import BeautifulSoup, SoupStrainer
+
+        # 只建立公告表格的樹, 其餘的版面不解析
+        soup = BeautifulSoup(
+            page_content,
+            "html.parser",
+            parse_only=SoupStrainer(
+                "table", {"summary": compile_pattern(self.table_pattern)}
+            ),
+        )
+        # 每一欄的文字與連結要放進資料列的哪個位置, 整頁只換算一次
+        layout = [
+            (None, None)
+            if header in self.exclude_columns
+            else (self.schema.index.get(header), self.schema.index.get(f"{header}連結"))
+            for header in self.extract_columns(soup, self.table_pattern, [])
+        ]
+        listed = {i for slots in layout for i in slots if i is not None}
+        link_idx = self.schema.index[self.link_label]
+        trs = soup.find_all("tr", {"class": compile_pattern(self.row_class_pattern)})
         rows = []
+        known_in_a_row = 0
         for tr in trs:
-            row = []
-            for idx, td in enumerate(tr.find_all("td")):
-                a_tag = td.find("a")
-                if a_tag:
-                    if f"{columns[idx]}連結" not in columns:
-                        columns.insert(idx + 1, f"{columns[idx]}連結")
-                    row.append(re.sub(r"\s+", "", td.text))
-                    row.append(urljoin(self.base_url, a_tag.get("href")))
-                elif idx == 4:
+            row = self.schema.empty()
+            for (text_idx, href_idx), td in zip(layout, tr.find_all("td")):
+                if text_idx is not None:
+                    row[text_idx] = strip_whitespace(td.text)
+                if href_idx is not None:
+                    a_tag = td.find("a")
+                    if a_tag:
+                        row[href_idx] = urljoin(self.base_url, a_tag.get("href"))
+            # 公告由新到舊排列, 連續遇到幾筆已存過的公告就不用再往下看
+            # (容許置頂的舊公告)
+            if stop_at_known and row[link_idx]:
+                link = row[link_idx]
+                if self.is_known_post(link) and not self.is_touched(link, changed_text):
+                    known_in_a_row += 1
+                    if known_in_a_row >= self.early_stop_after:
+                        break
                     continue
-                else:
-                    row.append(re.sub(r"\s+", "", td.text))
+                known_in_a_row = 0
             rows.append(row)
-        return columns, rows
+        return listed, rows
+
+    def extract_post_content(self, post_content_url: str) -> dict[str, str]:
+        from bs4 import BeautifulSoup, SoupStrainer
 
-    def extract_post_content(self, post_content_url: str):
         post_content = self.get_content(post_content_url)
-        soup = BeautifulSoup(post_content, "html.parser")
-        columns = self.extract_columns(soup, "\*", ["點閱次數", "標題", "發布日期", "發布單位"])
-        rows = [
-            re.sub(
-                r"\s+",
-                "",
-                soup.find("th", string=re.compile(c)).find_next_sibling("td").text,
+        soup = BeautifulSoup(
+            post_content,
+            "html.parser",
+            parse_only=SoupStrainer(
+                "table", {"summary": compile_pattern(self.detail_table_pattern)}
+            ),
+        )
+        columns = self.extract_columns(
+            soup, self.detail_table_pattern, self.detail_exclude_columns
+        )
+        return {
+            c: strip_whitespace(
+                soup.find("th", string=re.compile(c)).find_next_sibling("td").text
             )
             for c in columns
-        ]
-        return columns, rows
-
-    def combine_post_and_content(self, page_content):
-        cols, rows = self.extract_posts(page_content)
-        url_idx = cols.index("標題連結")
-
-        combine_cols = True
-        for row in rows:
-            ccols, crows = self.extract_post_content(row[url_idx])
-            if combine_cols:
-                cols += ccols
-                combine_cols = False
-            row += crows
-        cols, rows = self.adding_md5_value(cols, rows)
-        return cols, rows
-
-    def adding_md5_value(self, columns: list, rows: list[list]):
-        if "md5" not in columns:
-            columns.append("md5")
-        for row in rows:
-            md5 = self.hash_row_data(row)
-            row.append(md5)
-        return columns, rows
-
-    def insert_to_db(self, cols, row):
-        return self.db.insert(cols, row, self.table_name)
+        }
 
-    def main(self):
-        try:
-            page_content = self.get_content(urljoin(self.base_url, self.zsjhs_url))
-            cols, rows = self.combine_post_and_content(page_content)
-            count = 0
-            for row in rows:
-                if not self.db.exist(cols, row, self.table_name, "md5"):
-                    count += 1
-                    self.send_message(cols, row)
-                    self.insert_to_db(cols, row)
-                    logger.info(
-                        f'發送訊息: 標題: {row[cols.index("標題")]}, 發布日期: {row[cols.index("發布日期")]}'
+    def combine_post_and_content(self, page_content, changed_text: str = ""):
+        listed, rows = self.extract_posts(
+            page_content, stop_at_known=self.early_stop, changed_text=changed_text
+        )
+        url_idx = self.schema.index[self.link_label]
+        if listed.issuperset(self.schema.identity):
+            # 識別碼只用到列表上的欄位, 抓詳細內容前就能比對
+            hashes = [self.schema.identity_hash(row) for row in rows]
+            new_hashes = self.db.filter_new(self.table_name, hashes)
+            rows = [row for row, h in zip(rows, hashes) if h in new_hashes]
+        else:
+            # 已經存過且列表沒有變動的公告不再抓詳細內容
+            new_urls = self.db.filter_new(
+                self.table_name, [row[url_idx] for row in rows], label="link"
+            )
+            rows = [
+                row
+                for row in rows
+                if row[url_idx] in new_urls
+                or self.is_touched(row[url_idx], changed_text)
+            ]
+
+        if rows:
+            with ThreadPoolExecutor(max_workers=self.max_detail_workers) as executor:
+                contents = list(
+                    executor.map(
+                        self.extract_post_content, [row[url_idx] for row in rows]
                     )
-            if count == 0:
-                logger.info(f"沒有找到{self.name}相關的通知。")
-        except Exception as e:
-            logger.exception(e)
-            raise
+                )
+            index = self.schema.index
+            for row, content in zip(rows, contents):
+                for column, value in content.items():
+                    if column in index:
+                        row[index[column]] = value
+        return self.adding_md5_value(rows)
+
+    def adding_md5_value(self, rows: list[list]) -> list[Post]:
+        with self.stage("hash"):
+            return [self.schema.post(row) for row in rows]
+
+    def link_variants(self, link: str):
+        variants = super().link_variants(link)
+        # 列表頁上的 href 是相對路徑
+        if link.startswith(self.base_url):
+            relative = link[len(self.base_url) :]
+            variants += [relative, html.escape(relative)]
+        return variants
+
+    def parse(self, content: bytes):
+        return content.decode("utf-8")
+
+    def extract(self, page_content: str, changed_text: str = ""):
+        return self.combine_post_and_content(page_content, changed_text)
 
 
 class RSSWorker(Worker):
-    def __init__(self) -> None:
-        super().__init__()
-        self.filter_pattern = r"羽球|場地|租借"
-        self.cols: list = ["title", "link", "published", "description", "md5"]
+    def __init__(
+        self,
+        db: DB,
+        message_worker: Union[LineWorker, DiscordWorker],
+        source: dict,
+    ) -> None:
+        super().__init__(db, message_worker, source)
+        self.identity_keys: list = source.get("identity_keys", ["link", "published"])
+        self.schema = PostSchema(
+            ["title", "link", "published", "description"],
+            self.title_label,
+            self.link_label,
+            self.published_label,
+            self.identity_keys,
+            self.body_label,
+        )
+        self.db.migrate_table(self.table_name, self.schema)
+        self.db.migrate_identity(self.table_name, self.identity_keys, self.schema)
         self.published_format_string_in = "%a, %d %b %Y %H:%M:%S %Z"
         if system == "Windows":
             self.published_format_string_out = "%Y/%#m/%#d"
         else:
             self.published_format_string_out = "%Y/%-m/%-d"
 
-    def get_rss_data(self, url: str):
-        return feedparser.parse(url)
+    def parse(self, content: bytes):
+        import feedparser
+
+        return feedparser.parse(content)
+
+    @property
+    def filter_regex(self) -> re.Pattern:
+        return compile_pattern(self.filter_pattern)
 
-    def extract_rss_data(self, d):
+    def entry_timestamp(self, entry) -> Optional[int]:
+        published_parsed = entry.get("published_parsed")
+        return calendar.timegm(published_parsed) if published_parsed else None
+
+    def extract_rss_data(
+        self, d, high_water: Optional[int] = None, changed_text: str = ""
+    ):
         rss_data = []
-        for entry in d["entries"]:
+        hash_seconds = 0.0
+        # 由新到舊處理, 沒有發布時間的項目排最前面, 每次都會檢查
+        entries = sorted(
+            d["entries"],
+            key=lambda entry: self.entry_timestamp(entry) or math.inf,
+            reverse=True,
+        )
+        for entry in entries:
+            timestamp = self.entry_timestamp(entry)
+            if high_water is not None and timestamp is not None:
+                if timestamp <= high_water:
+                    # 舊的項目只有在快照中有變動時才需要再看
+                    if not changed_text:
+                        break
+                    if not self.is_touched(entry.get("link", ""), changed_text):
+                        continue
             title = entry.get("title", "")
+            # 先用標題過濾, 被濾掉的項目不必清理內容、轉換日期與計算 md5
+            if not self.is_wanted(title):
+                continue
             link = entry.get("link", "")
-            published_str = entry.get("published", "")
-            published = (
-                datetime.datetime.strptime(
-                    published_str, self.published_format_string_in
-                ).strftime(self.published_format_string_out)
-                if published_str != ""
-                else ""
-            )
-            description = re.sub(r"<.*?>|\s+", "", entry.get("description", ""))
-            md5 = self.hash_row_data([title, link, published, description])
-            rss_data.append([title, link, published, description, md5])
+            published = format_published(
+                entry.get("published", ""),
+                self.published_format_string_in,
+                self.published_format_string_out,
+            )
+            description = strip_tags(entry.get("description", ""))
+            # 每列各開一個 timer 太貴, 累計後只記一次
+            started = time.perf_counter()
+            # 依 schema.row_columns 的順序, 第四欄的識別碼由 post 填入
+            post = self.schema.post([title, link, published, "", description])
+            hash_seconds += time.perf_counter() - started
+            rss_data.append(post)
+        METRICS.observe(
+            "bcfinder_stage_seconds",
+            hash_seconds,
+            count=len(rss_data),
+            source=self.name,
+            stage="hash",
+        )
         return rss_data
 
-    def filter_rss_data(self, rss_data: list):
-        return list(filter(lambda x: re.search(self.filter_pattern, x[0]), rss_data))
+    def matches_filter(self, title: str) -> bool:
+        return self.filter_regex.search(title) is not None
 
+    def is_wanted(self, title: str) -> bool:
+        # 符合 filter_pattern, 或是有訂閱者的關鍵字出現在標題中
+        return self.matches_filter(title) or self.router.matches(title)
 
-class YHESWorker(RSSWorker):
-    def __init__(
-        self, db: DB, message_worker: Union[LineWorker, DiscordWorker]
-    ) -> None:
-        super().__init__()
-        self.name: str = "玉成國小"
-        self.db: DB = db
-        self.message_worker: Union[LineWorker, DiscordWorker] = message_worker
-        self.table_name: str = "yhes"
-        self.title_color: str = "#51f542"
-        self.rss_url: str = "https://www.yhes.tp.edu.tw/nss/main/feeder/5a9759adef37531ea27bf1b0/Cq0o5XU2162?f=normal&vector=private&static=false"
-        self.message_title = f"羽球場-{self.name}"
-        self.filter_pattern = r"羽球|場地|租借"
+    def filter_rss_data(self, rss_data: list[Post]):
+        return list(filter(lambda x: self.is_wanted(x.title), rss_data))
 
-    def insert_to_db(self, cols, row):
-        return self.db.insert(cols, row, self.table_name)
+    def extract(self, d, changed_text: str = ""):
+        high_water = self.db.get_high_water(self.table_name)
+        rss_data = self.extract_rss_data(d, high_water, changed_text)
+        return self.filter_rss_data(rss_data)
 
-    def send_message(self, col, row):
-        if isinstance(self.message_worker, LineWorker):
-            self.message_worker.send_flex_message(
-                to="group_chat",
-                alt_text=f"羽球場地通知-{self.name}",
-                flex_message=self.message_worker.format_flex_message(
-                    message_title=self.message_title,
-                    title_color=self.title_color,
-                    title=row[col.index("title")],
-                    link=self.get_shorten_url(row[col.index("link")]),
-                    published=row[col.index("published")],
-                ),
-            )
-        elif isinstance(self.message_worker, DiscordWorker):
-            asyncio.run(
-                self.message_worker.send_message(
-                    to="normal",
-                    text=self.message_worker.format_message(
-                        title=self.message_title,
-                        message_title=row[col.index("title")],
-                        link=self.get_shorten_url(row[col.index("link")]),
-                        published=row[col.index("published")],
-                    ),
-                )
-            )
+    def extract_state(self, d):
+        timestamps = [
+            timestamp
+            for timestamp in map(self.entry_timestamp, d["entries"])
+            if timestamp is not None
+        ]
+        return max(timestamps) if timestamps else None
+
+    def save_state(self, newest: Optional[int]):
+        # 高水位只往前推進, 避免 feed 暫時缺項目時倒退
+        if newest is None:
+            return
+        high_water = self.db.get_high_water(self.table_name)
+        if high_water is None or newest > high_water:
+            self.db.set_high_water(self.table_name, newest)
+
+
+### sources ###
+SOURCE_TYPES: dict = {
+    "html-table": HTMLTableWorker,
+    "rss": RSSWorker,
+}
+
+DEFAULT_SOURCES: list[dict] = [
+    {
+        "name": "中山國中",
+        "type": "html-table",
+        "url": "http://www.csjhs.tp.edu.tw/news/u_news_v1.asp?id={F246F2F4-4F1E-42DA-B518-5FB731FD672F}",
+        "table": "zsjhs",
+        "title_color": "#f5a142",
+    },
+    {
+        "name": "玉成國小",
+        "type": "rss",
+        "url": "https://www.yhes.tp.edu.tw/nss/main/feeder/5a9759adef37531ea27bf1b0/Cq0o5XU2162?f=normal&vector=private&static=false",
+        "table": "yhes",
+        "title_color": "#51f542",
+    },
+    {
+        "name": "三民國中",
+        "type": "rss",
+        "url": "https://www.smjh.tp.edu.tw/nss/main/feeder/5abf2d62aa93092cee58ceb4/P6nJedk3190?f=normal&%240=KJQUup08386&vector=private&static=false",
+        "table": "smjh",
+        "title_color": "#4287f5",
+    },
+]
+
+
+def load_sources() -> dict[str, dict]:
+    """內建來源加上 config.json 的 sources, 同名時以 config 的設定覆蓋"""
+    sources = {source["name"]: dict(source) for source in DEFAULT_SOURCES}
+    for source in CONFIG.get("sources", []):
+        sources[source["name"]] = {**sources.get(source["name"], {}), **source}
+    return sources
+
+
+### search ###
+def search_posts(
+    db: DB,
+    keyword: str = "",
+    days: Optional[int] = None,
+    names: Optional[list] = None,
+    limit: int = 20,
+) -> list[tuple]:
+    """跨來源搜尋公告, 回傳 (來源名稱, 標題, 連結, 發布日期), 新的在前"""
+    sources = load_sources()
+    tables = [sources[name]["table"] for name in names] if names else None
+    names_by_table = {source["table"]: name for name, source in sources.items()}
+    return [
+        (names_by_table.get(table, table), title, link, published)
+        for table, title, link, published in db.search(days, keyword, tables, limit)
+    ]
+
+
+def search_main(argv: list):
+    """python -m main search [關鍵字] [--days N] [--source 來源 ...] [--limit N]"""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m main search")
+    parser.add_argument("keyword", nargs="?", default="")
+    parser.add_argument("--days", type=int)
+    parser.add_argument("--source", action="append", dest="sources")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+    sources = load_sources()
+    unknown = [name for name in args.sources or [] if name not in sources]
+    if unknown:
+        parser.error(f"找不到來源: {', '.join(unknown)}\n可用的來源: {', '.join(sources)}")
+    db = DB()
+    for name, title, link, published in search_posts(
+        db, args.keyword, args.days, args.sources, args.limit
+    ):
+        print(f"{published or '-'} [{name}] {title}\n    {link}")
+    db.close()
 
-    def main(self):
-        try:
-            d = self.get_rss_data(self.rss_url)
-            rss_data = self.extract_rss_data(d)
-            rss_data = self.filter_rss_data(rss_data)
-            count = 0
-            for row in rss_data:
-                if not self.db.exist(self.cols, row, self.table_name, "md5"):
-                    count += 1
-                    self.send_message(self.cols, row)
-                    self.insert_to_db(self.cols, row)
-                    logger.info(
-                        f'發送訊息: 標題: {row[self.cols.index("title")]}, 發布日期: {row[self.cols.index("published")]}'
-                    )
-            if count == 0:
-                logger.info(f"沒有找到{self.name}相關的通知。")
-        except Exception as e:
-            logger.exception(e)
-            raise
 
+### shards ###
+# 子 process 內的資料庫連線與 worker, 每個 process 各自建立一次
+SHARD_DB: Optional[DB] = None
+SHARD_WORKERS: dict[str, Worker] = {}
 
-class SMJHWorker(RSSWorker):
-    def __init__(self, db: DB, message_worker: LineWorker) -> None:
-        super().__init__()
-        self.name: str = "三民國中"
-        self.db: DB = db
-        self.message_worker: Union[LineWorker, DiscordWorker] = message_worker
-        self.table_name: str = "smjh"
-        self.title_color: str = "#4287f5"
-        self.rss_url: str = "https://www.smjh.tp.edu.tw/nss/main/feeder/5abf2d62aa93092cee58ceb4/P6nJedk3190?f=normal&%240=KJQUup08386&vector=private&static=false"
-        self.message_title = f"羽球場-{self.name}"
-        self.filter_pattern = r"羽球|場地|租借"
 
-    def insert_to_db(self, cols, row):
-        return self.db.insert(cols, row, self.table_name)
+def init_shard(config: dict):
+    global SHARD_DB
+    CONFIG.update(config)
+    # 不沿用父 process 的連線, 第一個 worker 建立時再開新的
+    Worker.session = None
+    SHARD_DB = DB()
+    SHARD_DB.use_seen_filters = False
+    SHARD_WORKERS.clear()
 
-    def send_message(self, col, row):
-        if isinstance(self.message_worker, LineWorker):
-            self.message_worker.send_flex_message(
-                to="group_chat",
-                alt_text=f"羽球場地通知-{self.name}",
-                flex_message=self.message_worker.format_flex_message(
-                    message_title=self.message_title,
-                    title_color=self.title_color,
-                    title=row[col.index("title")],
-                    link=self.get_shorten_url(row[col.index("link")]),
-                    published=row[col.index("published")],
-                ),
-            )
-        elif isinstance(self.message_worker, DiscordWorker):
-            asyncio.run(
-                self.message_worker.send_message(
-                    to="normal",
-                    text=self.message_worker.format_message(
-                        title=self.message_title,
-                        message_title=row[col.index("title")],
-                        link=self.get_shorten_url(row[col.index("link")]),
-                        published=row[col.index("published")],
-                    ),
-                )
+
+def collect_source(source: dict) -> tuple[Optional[dict], dict]:
+    """在子 process 中抓取並解析一個來源, 內容沒有更新時回傳 None
+
+    一併回傳這次累計的統計, 由主 process 合併.
+    """
+    worker = SHARD_WORKERS.get(source["name"])
+    if worker is None or worker.source != source:
+        worker = SOURCE_TYPES[source["type"]](SHARD_DB, None, source)
+        SHARD_WORKERS[source["name"]] = worker
+    try:
+        content = worker.get_content_if_modified(worker.url)
+        collected = None if content is None else worker.collect(content)
+    finally:
+        metrics = METRICS.drain()
+    return collected, metrics
+
+
+def shard_of(name: str, shards: int) -> int:
+    # 用 crc32 而不是 hash(), 重啟後同一個來源仍落在同一個 shard
+    return zlib.crc32(name.encode("utf-8")) % shards
+
+
+class ShardPool:
+    """依來源名稱固定分配到數個子 process 抓取與解析
+
+    子 process 只讀資料庫, 快照、通知與寫入都交回主 process 處理,
+    資料庫始終只有一個寫入者. 某個 shard 的 process 掛掉時會重建後重試一次.
+    """
+
+    def __init__(self, shards: int, start_method: str = "spawn") -> None:
+        import multiprocessing
+
+        self.shards = shards
+        self.context = multiprocessing.get_context(start_method)
+        self.executors: dict[int, ProcessPoolExecutor] = {}
+
+    def executor(self, shard: int) -> ProcessPoolExecutor:
+        from concurrent.futures import ProcessPoolExecutor
+
+        if shard not in self.executors:
+            self.executors[shard] = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=self.context,
+                initializer=init_shard,
+                initargs=(CONFIG,),
             )
+        return self.executors[shard]
 
-    def main(self):
+    def restart(self, shard: int, executor: ProcessPoolExecutor):
+        # 同一個 shard 的其他來源可能已經重建過了
+        if self.executors.get(shard) is not executor:
+            return
+        logger.warning(f"shard {shard} 的 process 已中止, 重新建立")
+        del self.executors[shard]
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, source: dict) -> tuple[ProcessPoolExecutor, Future]:
+        from concurrent.futures.process import BrokenProcessPool
+
+        shard = shard_of(source["name"], self.shards)
+        executor = self.executor(shard)
         try:
-            d = self.get_rss_data(self.rss_url)
-            rss_data = self.extract_rss_data(d)
-            rss_data = self.filter_rss_data(rss_data)
-            count = 0
-            for row in rss_data:
-                if not self.db.exist(self.cols, row, self.table_name, "md5"):
-                    count += 1
-                    self.send_message(self.cols, row)
-                    self.insert_to_db(self.cols, row)
-                    logger.info(
-                        f'發送訊息: 標題: {row[self.cols.index("title")]}, 發布日期: {row[self.cols.index("published")]}'
-                    )
-            if count == 0:
-                logger.info(f"沒有找到{self.name}相關的通知。")
-        except Exception as e:
-            logger.exception(e)
-            raise
+            return executor, executor.submit(collect_source, source)
+        except BrokenProcessPool:
+            self.restart(shard, executor)
+            executor = self.executor(shard)
+            return executor, executor.submit(collect_source, source)
+
+    def collect(self, source: dict, submitted: tuple, timeout: float):
+        from concurrent.futures.process import BrokenProcessPool
+
+        executor, future = submitted
+        try:
+            return future.result(timeout=timeout)
+        except BrokenProcessPool:
+            self.restart(shard_of(source["name"], self.shards), executor)
+            return self.submit(source)[1].result(timeout=timeout)
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+        self.executors.clear()
 
 
 class BCFinder:
@@ -526,61 +2151,306 @@ class BCFinder:
         self,
         db: DB,
         message_worker: Union[LineWorker, DiscordWorker],
-        workers: list[Literal["中山國中", "玉成國小", "三民國中"]],
+        workers: Optional[list[str]] = None,
     ) -> None:
         self.db = db()
         self.message_worker = message_worker()
-        self.worker_type: dict = {
-            "中山國中": ZSJHSWorker,
-            "玉成國小": YHESWorker,
-            "三民國中": SMJHWorker,
-        }
-        assert len(workers) > 0, f"請至少註冊一種worker: {self.worker_type.keys()}"
+        self.max_concurrency: int = CONFIG.get("max_concurrency", 4)
+        self.source_timeout: int = CONFIG.get("source_timeout", 300)
+        self.shards: int = CONFIG.get("process_shards", 0)
+        self.shard_pool: Optional[ShardPool] = None
+        if self.shards > 0:
+            self.shard_pool = ShardPool(
+                self.shards, CONFIG.get("shard_start_method", "spawn")
+            )
+            atexit.register(self.shard_pool.shutdown)
+        self.retention_days: int = CONFIG.get("retention_days", 0)
+        self.maintenance_interval: float = CONFIG.get("maintenance_interval", 86400)
+        # 啟動後的第一輪就先維護一次
+        self.next_maintenance = 0.0
+        self.metrics_file: Optional[str] = CONFIG.get("metrics_file")
+        if CONFIG.get("metrics_port"):
+            METRICS.serve(CONFIG.get("metrics_port"))
+        self.sources: dict[str, dict] = load_sources()
+        if workers is None:
+            workers = list(self.sources)
+        assert len(workers) > 0, f"請至少註冊一種worker: {self.sources.keys()}"
         assert (
             len(
                 _invalid_workers := [
-                    worker for worker in workers if worker not in self.worker_type
+                    worker for worker in workers if worker not in self.sources
                 ]
             )
         ) == 0, f"註冊的worker無法辨識: {_invalid_workers}"
-        self.workers: list[
-            Union[ZSJHSWorker, YHESWorker, SMJHWorker]
-        ] = self.create_workers(self.db, self.message_worker, workers)
+        self.workers: list[Worker] = self.create_workers(
+            self.db, self.message_worker, workers
+        )
 
     def create_workers(
         self, db: DB, message_worker: Union[LineWorker, DiscordWorker], workers: list
     ):
-        return [self.worker_type[worker](db, message_worker) for worker in workers]
+        return [
+            SOURCE_TYPES[self.sources[worker]["type"]](
+                db, message_worker, self.sources[worker]
+            )
+            for worker in workers
+        ]
 
     def send_message(self, text: str):
         if isinstance(self.message_worker, LineWorker):
             self.message_worker.send_text_message(to="admin", text=text)
         elif isinstance(self.message_worker, DiscordWorker):
-            asyncio.run(self.message_worker.send_message(to="admin", text=text))
+            self.message_worker.send_message(to="admin", text=text)
 
-    def run_all(self):
-        for worker in self.workers:
+    def run_worker(self, worker: Worker):
+        """執行單一來源, 回傳新通知數量, 失敗時回傳例外"""
+        try:
+            logger.info(f"Run Scheduled Job: {local_now()} with {worker.name}")
+            return worker.main()
+        except Exception as e:
+            logger.exception(e)
+            return e
+
+    def run_workers(self, workers: list[Worker]) -> dict:
+        if self.shard_pool is not None:
+            return self.run_workers_sharded(workers)
+        results = {worker.name: self.run_worker(worker) for worker in workers}
+        self.finish_cycle(results)
+        return results
+
+    def finish_cycle(self, results: dict):
+        if time.monotonic() >= self.next_maintenance:
+            self.next_maintenance = time.monotonic() + self.maintenance_interval
+            self.db.maintain(self.retention_days)
+        self.db.checkpoint()
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                METRICS.inc("bcfinder_source_errors_total", source=name)
+        if self.metrics_file:
+            METRICS.write(self.metrics_file)
+
+    def run_workers_sharded(self, workers: list[Worker]) -> dict:
+        """子 process 平行抓取解析, 主 process 依序寫入並送出通知"""
+        futures = {}
+        for worker in workers:
+            logger.info(
+                f"Run Scheduled Job: {local_now()} with {worker.name} (shard {shard_of(worker.name, self.shards)})"
+            )
+            futures[worker.name] = self.shard_pool.submit(worker.source)
+        results = {}
+        for worker in workers:
             try:
-                logger.info(
-                    f"Run Scheduled Job: {datetime.datetime.now(pytz.timezone(CONFIG.get('tz')))} with {worker.name}"
+                collected, metrics = self.shard_pool.collect(
+                    worker.source, futures[worker.name], timeout=self.source_timeout
                 )
-                worker.main()
+                METRICS.merge(metrics)
+                if collected is None:
+                    logger.info(f"{worker.name}內容沒有更新。")
+                    results[worker.name] = 0
+                else:
+                    results[worker.name] = worker.commit(collected)
+            except Exception as e:
+                logger.exception(e)
+                results[worker.name] = e
+        self.finish_cycle(results)
+        return results
+
+    def run_all(self):
+        for result in self.run_workers(self.workers).values():
+            if isinstance(result, Exception):
+                self.send_message(text=self.format_exception(result))
+
+    def format_exception(self, e: Exception):
+        return "".join(traceback.format_exception(e))
+
+    async def run_worker_async(
+        self,
+        worker: Worker,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+    ):
+        async with semaphore:
+            try:
+                logger.info(f"Run Scheduled Job: {local_now()} with {worker.name}")
+                # 抓取列表頁受 session 的 ClientTimeout (source_timeout) 限制
+                return await worker.main_async(session)
             except Exception as e:
                 logger.exception(e)
-                self.send_message(text=str(traceback.format_exc()))
+                return e
+
+    async def run_workers_async(self, workers: list[Worker]) -> dict:
+        import aiohttp
+        import asyncio
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.source_timeout),
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+        ) as session:
+            results = await asyncio.gather(
+                *[
+                    self.run_worker_async(worker, session, semaphore)
+                    for worker in workers
+                ]
+            )
+        results = {worker.name: result for worker, result in zip(workers, results)}
+        self.finish_cycle(results)
+        return results
+
+    async def run_all_async(self):
+        for result in (await self.run_workers_async(self.workers)).values():
+            if isinstance(result, Exception):
+                self.send_message(text=self.format_exception(result))
+
+
+### scheduler ###
+class SourceState:
+    def __init__(self, interval: float, min_interval: float, max_interval: float):
+        # 預設間隔小於 min_schedule_interval 時, 以 max_interval 為準, 避免上下限顛倒
+        min_interval = min(min_interval, max_interval)
+        self.interval = min(max(interval, min_interval), max_interval)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.failures = 0
+
+
+class SourceScheduler:
+    """每個來源各自排程
+
+    有新公告時縮短間隔, 沒有時拉長; 失敗時以指數退避加上 jitter 重試,
+    同一段連續失敗只通知管理員一次. 兩次執行之間直接睡到下一個到期的來源.
+    """
+
+    def __init__(self, bcfinder: BCFinder) -> None:
+        self.bcfinder = bcfinder
+        self.async_mode: bool = CONFIG.get("async_mode", False)
+        self.speedup: float = CONFIG.get("schedule_speedup", 0.5)
+        self.slowdown: float = CONFIG.get("schedule_slowdown", 1.5)
+        self.backoff_base: float = CONFIG.get("backoff_base", 60)
+        self.backoff_max: float = CONFIG.get("backoff_max", 6 * 3600)
+        # 下一輪是否以 cProfile 剖析, 也可以送 SIGUSR1 觸發
+        self.profile_next: bool = CONFIG.get("profile_first_cycle", False)
+        self.profile_dir: str = CONFIG.get("profile_dir", ".")
+        default_interval = CONFIG.get("default_schedule_job_interval")
+        self.workers: dict[str, Worker] = {
+            worker.name: worker for worker in bcfinder.workers
+        }
+        self.states: dict[str, SourceState] = {
+            worker.name: SourceState(
+                interval=worker.source.get("interval", default_interval),
+                min_interval=worker.source.get(
+                    "min_interval", CONFIG.get("min_schedule_interval", 600)
+                ),
+                max_interval=worker.source.get(
+                    "max_interval",
+                    CONFIG.get("max_schedule_interval", default_interval),
+                ),
+            )
+            for worker in bcfinder.workers
+        }
+        now = time.time()
+        self.due: list[tuple[float, str]] = [
+            (now + self.jitter(state.interval), name)
+            for name, state in self.states.items()
+        ]
+        heapq.heapify(self.due)
+
+    def jitter(self, delay: float):
+        # 錯開各來源的執行時間, 避免同時打到同一台伺服器
+        return delay * random.uniform(0.9, 1.1)
+
+    def next_delay(self, name: str, result):
+        state = self.states[name]
+        if isinstance(result, Exception):
+            state.failures += 1
+            if state.failures == 1:
+                self.bcfinder.send_message(text=self.bcfinder.format_exception(result))
+            backoff = min(
+                self.backoff_max, self.backoff_base * 2 ** (state.failures - 1)
+            )
+            return random.uniform(backoff / 2, backoff)
+        if state.failures > 0:
+            logger.info(f"{name} 在失敗 {state.failures} 次後恢復")
+            state.failures = 0
+        if result:
+            state.interval = max(state.min_interval, state.interval * self.speedup)
+        else:
+            state.interval = min(state.max_interval, state.interval * self.slowdown)
+        return self.jitter(state.interval)
+
+    def request_profile(self, signum=None, frame=None):
+        logger.info("下一輪執行將以 cProfile 剖析")
+        self.profile_next = True
+
+    def run_profiled(self, run, *args):
+        """剖析一輪執行, 存成 .prof 檔並把最耗時的函式寫進 log"""
+        import cProfile
+        import pstats
+
+        self.profile_next = False
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(run, *args)
+        finally:
+            path = os.path.join(
+                self.profile_dir, f"bcfinder-{time.strftime('%Y%m%d-%H%M%S')}.prof"
+            )
+            profile.dump_stats(path)
+            stream = io.StringIO()
+            pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(
+                20
+            )
+            logger.info(f"剖析結果已存到 {path}\n{stream.getvalue()}")
+
+    def run_cycle(self, workers: list[Worker]):
+        if self.async_mode:
+            import asyncio
+
+            return asyncio.run(self.bcfinder.run_workers_async(workers))
+        return self.bcfinder.run_workers(workers)
+
+    def run_pending(self):
+        now = time.time()
+        names = []
+        while self.due and self.due[0][0] <= now:
+            names.append(heapq.heappop(self.due)[1])
+        if not names:
+            return
+        workers = [self.workers[name] for name in names]
+        with METRICS.timer("bcfinder_cycle_seconds"):
+            if self.profile_next:
+                results = self.run_profiled(self.run_cycle, workers)
+            else:
+                results = self.run_cycle(workers)
+        for name in names:
+            delay = self.next_delay(name, results[name])
+            logger.info(f"{name} 下次執行: {delay:.0f} 秒後")
+            heapq.heappush(self.due, (time.time() + delay, name))
+
+    def request_stop(self, signum, frame):
+        logger.info("收到 SIGTERM, 送完佇列中的通知後結束")
+        # 以 SystemExit 結束才會執行 atexit 註冊的 flush
+        sys.exit(0)
+
+    def run_forever(self):
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.request_profile)
+        # docker stop 送的是 SIGTERM, 預設會直接結束, 佇列與等待重試的通知都會遺失
+        signal.signal(signal.SIGTERM, self.request_stop)
+        while True:
+            self.run_pending()
+            time.sleep(max(0, self.due[0][0] - time.time()))
 
 
 if __name__ == "__main__":
+    load_config()
+    if sys.argv[1:2] == ["search"]:
+        search_main(sys.argv[2:])
+        sys.exit(0)
     bcfinder = BCFinder(
-        db=DB, message_worker=DiscordWorker, workers=["中山國中", "玉成國小", "三民國中"]
-    )
-    schedule.every(CONFIG.get("default_schedule_job_interval")).seconds.do(
-        bcfinder.run_all
+        db=DB, message_worker=DiscordWorker, workers=CONFIG.get("workers")
     )
+    scheduler = SourceScheduler(bcfinder)
 
-    logger.info(
-        f"Job Started At: {datetime.datetime.now(pytz.timezone(CONFIG.get('tz')))}"
-    )
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+    logger.info(f"Job Started At: {local_now()}")
+    scheduler.run_forever()
@@ -1,39 +1,174 @@
-from flask import Flask, request
-import json
-from linebot import LineBotApi, WebhookHandler
-from linebot.models import MessageEvent, TextMessage, TextSendMessage, FlexSendMessage
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, abort, request
+from linebot import LineBotApi, WebhookParser
+from linebot.exceptions import InvalidSignatureError
+from linebot.models import MessageEvent, TextMessage, TextSendMessage
+from loguru import logger
+import threading
+import time
 
-with open("config.json") as f:
-    c = f.read()
-    CONFIG = json.loads(c)
+from main import CONFIG, DB, load_config, load_sources, search_posts
 
+load_config()
 app = Flask(__name__)
 
+# client 只建立一次, 每個 request 共用
+line_bot_api = LineBotApi(
+    CONFIG.get("line_channel_access_token"),
+    endpoint=CONFIG.get("line_api_endpoint", "https://api.line.me"),
+)
+parser = WebhookParser(CONFIG.get("line_channel_secret"))
+# 回覆在背景送出, webhook 收到就先回 200
+executor = ThreadPoolExecutor(max_workers=CONFIG.get("webhook_max_workers", 4))
 
-@app.route("/", methods=["POST"])
-def linebot():
-    body = request.get_data(as_text=True)  # 取得收到的訊息內容
+LATEST_COMMANDS = ("最新公告", "最新場地")
+SEARCH_COMMANDS = ("搜尋", "search")
+HELP_COMMANDS = ("說明", "help")
+# Line 文字訊息上限 5000 字
+MAX_TEXT_LENGTH = 5000
+
+
+class TTLCache:
+    """指令回覆的記憶體快取, 過期前不再查 SQLite
+
+    key 含有使用者輸入的搜尋字串, 最多保留 max_size 筆, 超過時移除最久沒用到的,
+    寫入時順便清掉已過期的項目.
+    """
+
+    def __init__(self, ttl: float, max_size: int) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.items: OrderedDict = OrderedDict()
+
+    def get_or_set(self, key, factory):
+        now = time.monotonic()
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None and item[0] > now:
+                self.items.move_to_end(key)
+                return item[1]
+        value = factory()
+        with self.lock:
+            for expired in [
+                k for k, (expires, _) in self.items.items() if expires <= now
+            ]:
+                del self.items[expired]
+            self.items[key] = (now + self.ttl, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+        return value
+
+
+cache = TTLCache(
+    CONFIG.get("webhook_cache_ttl", 60), CONFIG.get("webhook_cache_size", 256)
+)
+sources = load_sources()
+db_lock = threading.Lock()
+db = None
+
+
+def get_db() -> DB:
+    # 第一次查詢時才連線, 只有 webhook 驗證的時候不必開資料庫
+    global db
+    with db_lock:
+        if db is None:
+            db = DB()
+        return db
+
+
+def latest_posts(names: list[str]) -> str:
+    limit = CONFIG.get("latest_post_count", 5)
+    blocks = []
+    for name in names:
+        rows = get_db().latest_posts(sources[name]["table"], limit)
+        lines = [f"【{name}】"]
+        lines += [f"{published} {title}\n{link}" for title, link, published in rows]
+        if not rows:
+            lines.append("目前沒有公告")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)[:MAX_TEXT_LENGTH]
+
+
+def search_text(keyword: str, days: int) -> str:
+    results = search_posts(
+        get_db(), keyword, days, limit=CONFIG.get("search_result_count", 10)
+    )
+    if not results:
+        return f"最近 {days} 天沒有符合「{keyword}」的公告"
+    lines = [f"最近 {days} 天符合「{keyword}」的公告:"]
+    lines += [
+        f"{published} 【{name}】{title}\n{link}"
+        for name, title, link, published in results
+    ]
+    return "\n\n".join(lines)[:MAX_TEXT_LENGTH]
+
+
+def help_text() -> str:
+    return "\n".join(
+        [
+            "可以使用的指令:",
+            f"{LATEST_COMMANDS[0]} - 各來源最新的場地公告",
+            f"{LATEST_COMMANDS[0]} <來源> - 指定來源, 例如: {LATEST_COMMANDS[0]} {next(iter(sources))}",
+            f"{SEARCH_COMMANDS[0]} <關鍵字> [天數] - 搜尋最近的公告, 例如: {SEARCH_COMMANDS[0]} 羽球 30",
+            f"{HELP_COMMANDS[0]} - 顯示這個說明",
+        ]
+    )
+
+
+def reply_for(text: str) -> str:
+    command, _, argument = text.strip().partition(" ")
+    if command in LATEST_COMMANDS:
+        names = [argument.strip()] if argument.strip() else list(sources)
+        unknown = [name for name in names if name not in sources]
+        if unknown:
+            return f"找不到來源: {', '.join(unknown)}\n可用的來源: {', '.join(sources)}"
+        return cache.get_or_set(("latest", tuple(names)), lambda: latest_posts(names))
+    if command.lower() in SEARCH_COMMANDS:
+        words = argument.split()
+        days = CONFIG.get("search_days", 30)
+        if words and words[-1].isdigit():
+            days = int(words.pop())
+        keyword = " ".join(words)
+        if not keyword:
+            return f"請輸入關鍵字, 例如: {SEARCH_COMMANDS[0]} 羽球 30"
+        return cache.get_or_set(
+            ("search", keyword, days), lambda: search_text(keyword, days)
+        )
+    if command.lower() in HELP_COMMANDS:
+        return help_text()
+    return text
+
+
+def handle_event(event):
     try:
-        json_data = json.loads(body)  # json 格式化訊息內容
-        access_token = CONFIG.get("line_channel_access_token")
-        secret = CONFIG.get("line_channel_secret")
-        line_bot_api = LineBotApi(access_token)  # 確認 token 是否正確
-        handler = WebhookHandler(secret)  # 確認 secret 是否正確
-        signature = request.headers["X-Line-Signature"]  # 加入回傳的 headers
-        handler.handle(body, signature)  # 綁定訊息回傳的相關資訊
-        tk = json_data["events"][0]["replyToken"]  # 取得回傳訊息的 Token
-        type = json_data["events"][0]["message"]["type"]  # 取得 LINe 收到的訊息類型
-        if type == "text":
-            print(json_data)
-            msg = json_data["events"][0]["message"]["text"]  # 取得 LINE 收到的文字訊息
-            print(msg)  # 印出內容
-            reply = msg
+        if not isinstance(event, MessageEvent):
+            logger.debug(f"略過事件: {event.type}")
+            return
+        if isinstance(event.message, TextMessage):
+            logger.info(f"收到訊息: {event.message.text}")
+            reply = reply_for(event.message.text)
         else:
             reply = "你傳的不是文字呦～"
-        print(reply)
-        line_bot_api.reply_message(tk, TextSendMessage(reply))  # 回傳訊息
-    except:
-        print(body)  # 如果發生錯誤，印出收到的內容
+        line_bot_api.reply_message(event.reply_token, TextSendMessage(reply))
+    except Exception as e:
+        logger.exception(e)
+
+
+@app.route("/", methods=["POST"])
+def linebot():
+    body = request.get_data(as_text=True)
+    signature = request.headers.get("X-Line-Signature", "")
+    try:
+        # 驗證簽章並解析事件, 整個 body 只處理一次
+        events = parser.parse(body, signature)
+    except InvalidSignatureError:
+        logger.warning(f"簽章驗證失敗: {body}")
+        abort(400)
+    for event in events:
+        executor.submit(handle_event, event)
     return "OK"  # 驗證 Webhook 使用，不能省略
 
 
@@ -0,0 +1,64 @@
+"""commit 中途失敗時不能留下快照, 下一輪要與上一份處理完的快照比較."""
+import importlib
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from replay import ReplayServer, bench_env, load_fixtures  # noqa: E402
+
+
+class CommitTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.server = ReplayServer(load_fixtures())
+        self.workdir = bench_env(self.server)
+        self.main = importlib.import_module("main")
+        self.main.load_config()
+        self.bcfinder = self.main.BCFinder(
+            db=self.main.DB, message_worker=self.main.LineWorker
+        )
+
+    def tearDown(self):
+        self.bcfinder.message_worker.flush()
+        self.bcfinder.db.close()
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def snapshot_count(self, name: str) -> int:
+        ((count,),) = self.bcfinder.db.query(
+            f"SELECT count(*) FROM source_snapshots WHERE source = '{name}'"
+        )
+        return count
+
+    def test_failed_commit_keeps_previous_snapshot(self):
+        db = self.bcfinder.db
+        worker = next(w for w in self.bcfinder.workers if w.table_name == "smjh")
+        self.bcfinder.run_workers([worker])
+        previous = db.latest_snapshot(worker.name)
+        validators = db.get_validators(worker.url)
+
+        self.server.revision += 1
+
+        def fail(state):
+            raise RuntimeError("save_state failed")
+
+        worker.save_state = fail
+        result = self.bcfinder.run_workers([worker])[worker.name]
+        self.assertIsInstance(result, RuntimeError)
+        self.assertEqual(db.latest_snapshot(worker.name), previous)
+        self.assertEqual(db.get_validators(worker.url), validators)
+        self.assertEqual(self.snapshot_count(worker.name), 1)
+
+        del worker.save_state
+        self.assertEqual(self.bcfinder.run_workers([worker])[worker.name], 0)
+        self.assertNotEqual(db.latest_snapshot(worker.name), previous)
+        self.assertEqual(self.snapshot_count(worker.name), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
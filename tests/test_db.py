@@ -0,0 +1,49 @@
+"""DB.filter_new 的 Bloom filter 與 recent 不能把已刪除的公告當成還存在."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main  # noqa: E402
+
+
+def record(md5: str, link: str, published: str = "2024/1/1"):
+    return (md5, "羽球場地", link, published, "", None)
+
+
+class FilterNewTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        main.CONFIG.update(tz="Asia/Taipei")
+        self.db = main.DB()
+
+    def tearDown(self):
+        self.db.close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_replaced_post_is_new_again(self):
+        self.db.insert_posts("s", [record("A", "http://x/1")])
+        self.assertEqual(self.db.filter_new("s", ["A"]), set())
+        # 公告被編輯成 B, 之後又改回 A
+        self.db.replace_posts("s", [record("B", "http://x/1")])
+        self.assertEqual(self.db.filter_new("s", ["A", "B"]), {"A"})
+        self.assertEqual(self.db.filter_new("s", ["http://x/1"], label="link"), set())
+
+    def test_pruned_post_is_new_again(self):
+        self.db.insert_posts("s", [record("A", "http://x/1", "2000/1/1")])
+        self.assertEqual(self.db.filter_new("s", ["http://x/1"], label="link"), set())
+        self.db.prune(30)
+        self.assertEqual(self.db.filter_new("s", ["A"]), {"A"})
+        self.assertEqual(
+            self.db.filter_new("s", ["http://x/1"], label="link"), {"http://x/1"}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+"""舊版 bcdb.db (各來源各一張資料表, md5 為整列的雜湊) 搬進 posts 表的測試.
+
+以 benchmarks/fixtures 的重播伺服器取得公告內容, 再照 baseline 的欄位與 md5
+寫成舊版的資料庫, 確認搬移後筆數不變、下一輪不會重送、重跑搬移不會有任何變動.
+"""
+import glob
+import hashlib
+import importlib
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from replay import ReplayServer, bench_env, load_fixtures  # noqa: E402
+
+# baseline 的資料表, 中山國中是中文欄位, RSS 來源是英文欄位
+LEGACY_COLUMNS = {
+    "zsjhs": ["序號", "標題", "標題連結", "發布單位", "發布日期", "詳細內容", "相關連結", "相關檔案"],
+    "yhes": ["title", "link", "published", "description"],
+    "smjh": ["title", "link", "published", "description"],
+}
+# baseline 的 RSS worker 只存標題符合的公告
+LEGACY_RSS_FILTER = r"羽球|場地|租借"
+
+
+def legacy_md5(row: list) -> str:
+    """baseline 的 Worker.hash_row_data: 依序串接整列的值"""
+    md5 = hashlib.md5()
+    for data in row:
+        md5.update(data.encode("utf-8"))
+    return md5.hexdigest()
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.server = ReplayServer(load_fixtures())
+        self.workdir = bench_env(self.server)
+        self.main = importlib.import_module("main")
+        self.main.load_config()
+        self.legacy_counts = self.build_legacy_db()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def new_bcfinder(self):
+        return self.main.BCFinder(db=self.main.DB, message_worker=self.main.LineWorker)
+
+    def build_legacy_db(self) -> dict[str, int]:
+        """先以目前的程式抓一輪取得各欄位的值, 再換成 baseline 形狀的 bcdb.db"""
+        bcfinder = self.new_bcfinder()
+        bcfinder.run_all()
+        bcfinder.message_worker.flush()
+        rows = {}
+        for worker in bcfinder.workers:
+            stored = bcfinder.db.query(
+                f"SELECT title, link, published, inflate(body), extra FROM posts WHERE source = '{worker.table_name}' ORDER BY rowid"
+            )
+            columns = LEGACY_COLUMNS[worker.table_name]
+            rows[worker.table_name] = []
+            for record in stored:
+                values = worker.schema.values(*record)
+                row = [values[worker.schema.index[col]] for col in columns]
+                if worker.table_name != "zsjhs" and not re.search(
+                    LEGACY_RSS_FILTER, row[0]
+                ):
+                    continue
+                rows[worker.table_name].append(row + [legacy_md5(row)])
+        bcfinder.db.close()
+        for path in glob.glob(os.path.join(self.workdir, "bcdb.db*")):
+            os.remove(path)
+
+        con = sqlite3.connect(os.path.join(self.workdir, "bcdb.db"))
+        with con:
+            for table, columns in LEGACY_COLUMNS.items():
+                definition = ", ".join(f"{col} TEXT" for col in columns)
+                con.execute(
+                    f"CREATE TABLE {table} ({definition}, md5 VARCHAR(10) PRIMARY KEY)"
+                )
+                con.executemany(
+                    f"INSERT INTO {table} VALUES({','.join('?' * (len(columns) + 1))})",
+                    rows[table],
+                )
+        con.close()
+        self.server.counts.clear()
+        return {table: len(table_rows) for table, table_rows in rows.items()}
+
+    def posts(self, db) -> list:
+        return db.query(
+            "SELECT source, md5, title, link, published, published_on, body, extra FROM posts ORDER BY rowid"
+        )
+
+    def test_migrate_legacy_db(self):
+        self.assertTrue(all(self.legacy_counts.values()))
+        bcfinder = self.new_bcfinder()
+        db = bcfinder.db
+        tables = {name for (name,) in db.query("SELECT name FROM sqlite_master")}
+        self.assertFalse(tables & set(LEGACY_COLUMNS))
+        counts = dict(db.query("SELECT source, count(*) FROM posts GROUP BY source"))
+        self.assertEqual(counts, self.legacy_counts)
+        migrated = self.posts(db)
+
+        # 搬移過的公告不能再送一次
+        bcfinder.run_all()
+        bcfinder.message_worker.flush()
+        self.assertNotIn("line", self.server.counts)
+        after_cycle = self.posts(db)
+        self.assertEqual(after_cycle[: len(migrated)], migrated)
+
+        # 再跑一次搬移不會有任何變動
+        for worker in bcfinder.workers:
+            db.migrate_table(worker.table_name, worker.schema)
+            db.migrate_identity(worker.table_name, worker.identity_keys, worker.schema)
+        self.assertEqual(self.posts(db), after_cycle)
+        db.close()
+        bcfinder = self.new_bcfinder()
+        self.assertEqual(self.posts(bcfinder.db), after_cycle)
+        bcfinder.db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
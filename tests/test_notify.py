@@ -0,0 +1,84 @@
+"""一個批次分成數次 API 呼叫時, 失敗後只重送還沒送出的訊息."""
+import os
+import sys
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import main  # noqa: E402
+
+
+class FlakyDiscordWorker(main.DiscordWorker):
+    """第 fail_at 次 (從 0 起算) 呼叫 API 時失敗一次"""
+
+    fail_at = 1
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.sent = []
+        super().__init__()
+
+    def post_message(self, channel_id, content: str):
+        self.calls += 1
+        if self.calls - 1 == self.fail_at:
+            raise RuntimeError("500 Server Error")
+        self.sent += content.split("\n\n")
+
+
+class FlakyLineWorker(main.LineWorker):
+    fail_at = 1
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.sent = []
+        super().__init__()
+        self.api_client.push_message = self.push_message
+
+    def push_message(self, to, messages):
+        self.calls += 1
+        if self.calls - 1 == self.fail_at:
+            raise RuntimeError("500 Server Error")
+        self.sent += [message.text for message in messages]
+
+
+class DeliveryTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        # LineWorker 從目前目錄讀取 line_flex_message_template.json
+        os.chdir(ROOT)
+        main.CONFIG.update(
+            notify_batch_wait=0.01,
+            notify_retry_base=0,
+            line_channel_access_token="token",
+            line_channel_secret="secret",
+        )
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def test_discord_resends_only_undelivered(self):
+        worker = FlakyDiscordWorker()
+        # 每則都接近 2000 字, 一則一次 API 呼叫
+        texts = [f"post-{i}" + "x" * 1990 for i in range(3)]
+        worker.submit("normal", texts[0])
+        worker.submit("normal", texts[1])
+        worker.submit("normal", texts[2])
+        worker.flush()
+        self.assertEqual(
+            [text[:6] for text in worker.sent], ["post-0", "post-1", "post-2"]
+        )
+
+    def test_line_resends_only_undelivered(self):
+        from linebot.models import TextSendMessage
+
+        worker = FlakyLineWorker()
+        # push_message 一次最多 5 則, 12 則分成 3 次
+        for i in range(12):
+            worker.submit("group_chat", TextSendMessage(f"post-{i}"))
+        worker.flush()
+        self.assertEqual(worker.sent, [f"post-{i}" for i in range(12)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""process_shards 的子 process 只讀資料庫, 不能誤把主 process 已存的公告當成新的."""
+import importlib
+import os
+import shutil
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+from replay import ReplayServer, bench_env, load_fixtures  # noqa: E402
+
+
+class ShardTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.server = ReplayServer(load_fixtures())
+        self.workdir = bench_env(self.server, {"process_shards": 1})
+        self.main = importlib.import_module("main")
+        self.main.load_config()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_changed_cycle_fetches_no_details(self):
+        bcfinder = self.main.BCFinder(
+            db=self.main.DB, message_worker=self.main.LineWorker
+        )
+        try:
+            bcfinder.run_all()
+            bcfinder.message_worker.flush()
+            self.assertGreater(self.server.counts["GET"], len(self.server.fixtures))
+
+            # 列表頁有變動但公告都已存過, 只應抓各來源的列表頁 / feed
+            self.server.revision += 1
+            self.server.counts.clear()
+            bcfinder.run_all()
+            bcfinder.message_worker.flush()
+            self.assertEqual(self.server.counts, {"GET": len(self.server.fixtures)})
+        finally:
+            bcfinder.shard_pool.shutdown()
+            bcfinder.db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""各 worker 共用的文字正規化工具, regex 皆預先編譯."""
+import datetime
+import functools
+import re
+
+WHITESPACE = re.compile(r"\s+")
+TAG_OR_WHITESPACE = re.compile(r"<.*?>|\s+")
+
+
+def strip_whitespace(text: str) -> str:
+    return WHITESPACE.sub("", text)
+
+
+def strip_tags(text: str) -> str:
+    return TAG_OR_WHITESPACE.sub("", text)
+
+
+@functools.lru_cache(maxsize=128)
+def compile_pattern(pattern: str) -> re.Pattern:
+    return re.compile(pattern)
+
+
+@functools.lru_cache(maxsize=4096)
+def format_published(published: str, format_in: str, format_out: str) -> str:
+    # 同一個 feed 的日期字串重複率很高, 快取 strptime 的結果
+    if published == "":
+        return ""
+    return datetime.datetime.strptime(published, format_in).strftime(format_out)
+
+
+DATE = re.compile(r"(\d{2,4})\s*[/.\-年]\s*(\d{1,2})\s*[/.\-月]\s*(\d{1,2})")
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_date(text: str):
+    """把 2023/7/5、112/07/05 (民國年) 等日期轉成 2023-07-05, 無法辨識時回傳 None"""
+    m = DATE.search(text)
+    if m is None:
+        return None
+    year, month, day = map(int, m.groups())
+    if year < 1911:
+        year += 1911
+    try:
+        return datetime.date(year, month, day).isoformat()
+    except ValueError:
+        return None